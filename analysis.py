@@ -1,21 +1,41 @@
 import matplotlib.pyplot as plt
+from matplotlib.ticker import MaxNLocator
 import numpy as np
 import pandas as pd
+import tempfile
+
+from mdp import get_compiled_form_of_mdp
 
 
 class Analyzer:
     """
     Clase para analizar y visualizar la evolución de los valores de estado
     durante la iteración de políticas.
+
+    Cada ejecución se guarda como un array (iteraciones x estados) sobre el índice de estados de la forma compilada
+    del MDP, que crece duplicando su capacidad. Si se indica `memmap_dir`, las ejecuciones que superan
+    `memmap_after` iteraciones se trasladan a un fichero mapeado en memoria.
     """
 
-    def __init__(self, mdp):
+    def __init__(self, mdp, memmap_dir=None, memmap_after=1000, initial_capacity=16, compiled=None):
         """
         :param mdp: The MDP that is being analyzed
+        :param memmap_dir: optional directory where long runs are spilled to memory-mapped files
+        :param memmap_after: number of iterations from which a run is kept in a memory-mapped file
+        :param initial_capacity: number of iterations preallocated for each run
+        :param compiled: compiled form whose state index the recorded arrays use (e.g. `evaluator.compiled` of an
+            evaluator created with `reachable=True`); the full compiled form of `mdp` if not given
         """
         self.mdp = mdp
+        self.compiled = get_compiled_form_of_mdp(mdp) if compiled is None else compiled
+        self.states = self.compiled.states
+        self.non_terminal = ~self.compiled.terminal  # máscara calculada una sola vez
+        self.memmap_dir = memmap_dir
+        self.memmap_after = memmap_after
+        self.initial_capacity = initial_capacity
         self.runs = {}  # Diccionario para almacenar los datos de cada ejecución
         self.current_run = None
+        self._cells = None  # (fila, columna) de cada estado, para colocar los valores en la cuadrícula
     
     def new_run(self, name):
         """
@@ -25,25 +45,71 @@ class Analyzer:
         del algoritmo de aprendizaje de políticas
         """
         self.runs[name] = {
-            'iterations': [],
-            'state_values': [],
+            'values': self._allocate(self.initial_capacity),
             'iteration_count': 0
         }
         self.current_run = name
+
+    def _allocate(self, capacity):
+        """
+        :param capacity: number of iterations that fit in the buffer
+        :return: empty (capacity x S) float buffer, memory-mapped if the run has become long
+        """
+        shape = (capacity, len(self.states))
+        if self.memmap_dir is not None and capacity > self.memmap_after:
+            # fichero temporal anónimo: se borra solo cuando el buffer deja de usarse
+            return np.memmap(tempfile.TemporaryFile(dir=self.memmap_dir), dtype=float, mode='w+', shape=shape)
+        return np.empty(shape)
     
     def add_state_value_estimates(self, v):
         """
-        :param v: dictionary with state values or estimates thereof
+        :param v: dictionary with state values or estimates thereof, or array with one value per state in the
+            order of the compiled state index
         
         Añade las estimaciones de valores de estado al historial de la ejecución actual
         """
         if self.current_run is None:
             raise ValueError("No current run set. Call new_run() first.")
-        
-        iteration = self.runs[self.current_run]['iteration_count']
-        self.runs[self.current_run]['iterations'].append(iteration)
-        self.runs[self.current_run]['state_values'].append(v.copy())
-        self.runs[self.current_run]['iteration_count'] += 1
+
+        run = self.runs[self.current_run]
+        iteration = run['iteration_count']
+        if iteration == len(run['values']):
+            values = self._allocate(2 * len(run['values']))
+            values[:iteration] = run['values']
+            run['values'] = values
+        if isinstance(v, dict):
+            run['values'][iteration] = np.fromiter(map(v.__getitem__, self.states), dtype=float, count=len(self.states))
+        else:
+            # un array sobre otro índice de estados (p. ej. el de un evaluador con reachable=True) quedaría desalineado
+            if np.shape(v) != (len(self.states),):
+                raise ValueError(
+                    f"Expected {len(self.states)} state values but got an array of shape {np.shape(v)}; create the "
+                    f"Analyzer with the compiled form of the evaluator (`compiled=evaluator.compiled`)."
+                )
+            run['values'][iteration] = v
+        run['iteration_count'] += 1
+
+    def record_run(self, name, snapshots):
+        """
+        :param name: The name of the run, used for figures
+        :param snapshots: iterable of `PolicySnapshot`s (e.g. `PolicyIteration.iterate()`), consumed lazily
+        :return: the last snapshot of the run (None if there was none)
+
+        Registra como una nueva ejecución los valores de estado de cada snapshot
+        """
+        self.new_run(name)
+        snapshot = None
+        for snapshot in snapshots:
+            self.add_state_value_estimates(snapshot.v)
+        return snapshot
+
+    def get_state_values(self, run_name):
+        """
+        :param run_name: name of the run
+        :return: array (iterations x S) with the recorded state values of the run (a view, not a copy)
+        """
+        run = self.runs[run_name]
+        return run['values'][:run['iteration_count']]
     
     def plot_state_value_estimates_of_init_state_over_time(self, ax=None):
         """
@@ -55,13 +121,11 @@ class Analyzer:
         if ax is None:
             fig, ax = plt.subplots(figsize=(10, 6))
         
-        init_state = self.mdp.init_states[0]  # Tomamos el primer estado inicial
+        init_index = self.compiled.state_index[self.mdp.init_states[0]]  # Tomamos el primer estado inicial
         
-        for run_name, run_data in self.runs.items():
-            iterations = run_data['iterations']
-            values = [state_values[init_state] for state_values in run_data['state_values']]
-            
-            ax.step(iterations, values, where='post', label=run_name)
+        for run_name in self.runs:
+            values = self.get_state_values(run_name)
+            ax.step(np.arange(len(values)), values[:, init_index], where='post', label=run_name)
         
         ax.set_xlabel('Iteration t')
         ax.set_ylabel(r'$v_t(s_0)$')
@@ -80,21 +144,16 @@ class Analyzer:
         if ax is None:
             fig, ax = plt.subplots(figsize=(10, 6))
         
-        for run_name, run_data in self.runs.items():
-            iterations = run_data['iterations']
+        for run_name in self.runs:
+            values = self.get_state_values(run_name)
             
-            # Calcular el valor promedio de todos los estados en cada iteración
-            avg_values = []
-            for state_values in run_data['state_values']:
-                # Filtramos estados terminales o estados con valores extremos
-                valid_states = [s for s in state_values.keys() if not self.mdp.is_terminal_state(s)]
-                if valid_states:
-                    avg_value = sum(state_values[s] for s in valid_states) / len(valid_states)
-                else:
-                    avg_value = 0
-                avg_values.append(avg_value)
+            # Valor promedio de los estados no terminales en cada iteración
+            if self.non_terminal.any():
+                avg_values = values @ self.non_terminal / np.count_nonzero(self.non_terminal)
+            else:
+                avg_values = np.zeros(len(values))
             
-            ax.step(iterations, avg_values, where='post', label=run_name)
+            ax.step(np.arange(len(values)), avg_values, where='post', label=run_name)
         
         ax.set_xlabel('Iteration t')
         ax.set_ylabel(r'$\overline{v}_t(s)$')
@@ -103,34 +162,54 @@ class Analyzer:
         
         return ax
     
-    def create_heatmap_of_state_values(self, v, title=None, ax=None, vmin=None, vmax=None):
+    def to_grids(self, values):
+        """
+        :param values: array (..., S) with state values over the compiled state index, or a dictionary with state values
+        :return: array (..., m, n) with the values placed on the cells of the lake (0 in cells without a state)
+        """
+        if isinstance(values, dict):
+            values = np.fromiter(map(values.__getitem__, self.states), dtype=float, count=len(self.states))
+        values = np.asarray(values, dtype=float)
+        if self._cells is None:
+            self._cells = np.array(self.states).reshape(len(self.states), 2)
+        grids = np.zeros(values.shape[:-1] + self.mdp.world.shape)
+        grids[..., self._cells[:, 0], self._cells[:, 1]] = values
+        return grids
+
+    def draw_heatmap(self, grid, ax, vmin=None, vmax=None, max_annotated_cells=400, animated=False):
+        """
+        Dibuja un heatmap como una única imagen que se puede actualizar en el sitio con `image.set_data`.
+
+        :param grid: array (m, n) with the values of the cells
+        :param ax: axis object where the heatmap is drawn
+        :param vmin: valor mínimo para la escala de color (opcional)
+        :param vmax: valor máximo para la escala de color (opcional)
+        :param max_annotated_cells: los valores se escriben solo si el zoom deja a la vista como mucho estas celdas
+        :param animated: True si la imagen y los textos se redibujan con blitting
+        :return: par (imagen, CellAnnotations)
+        """
+        image = ax.imshow(grid, cmap='coolwarm', vmin=vmin, vmax=vmax, interpolation='nearest', animated=animated)
+        annotations = CellAnnotations(ax, grid, max_annotated_cells, animated)
+        return image, annotations
+
+    def create_heatmap_of_state_values(self, v, title=None, ax=None, vmin=None, vmax=None, max_annotated_cells=400):
 
         """
         Crea una visualización de mapa de calor de los valores de estado para un MDP basado en cuadrícula como Lake
     
-        :param v: dictionary with state values
+        :param v: dictionary with state values, or array with one value per state over the compiled state index
         :param title: optional title for the heatmap
         :param ax: optional axis object where the heatmap is drawn
         :param vmin: valor mínimo para la escala de color (opcional)
         :param vmax: valor máximo para la escala de color (opcional)
+        :param max_annotated_cells: los valores (y la rejilla) se dibujan solo si hay como mucho estas celdas a la vista
         :return: el objeto axis donde se dibujó el heatmap
         """
         
         if ax is None:
             fig, ax = plt.subplots(figsize=(10, 8))
         
-        # Determinar el tamaño de la cuadrícula a partir del MDP del lago
-        grid_shape = self.mdp.world.shape
-        
-        # Crear una matriz para el mapa de calor
-        heatmap_data = np.zeros(grid_shape)
-        
-        # Llenar la matriz con los valores de los estados
-        for s in v:
-            if isinstance(s, tuple) and len(s) == 2:
-                r, c = s
-                if 0 <= r < grid_shape[0] and 0 <= c < grid_shape[1]:
-                    heatmap_data[r, c] = v[s]
+        heatmap_data = self.to_grids(v)
         
         #Calcular límites
         if vmin is None:
@@ -138,50 +217,96 @@ class Analyzer:
         if vmax is None:
             vmax = np.max(heatmap_data)
         
-        # Crear el mapa de calor con límites específicos
-        im = ax.imshow(heatmap_data, cmap='coolwarm', vmin=vmin, vmax=vmax)
-        
-        # Añadir los valores como texto en cada celda
-        for i in range(grid_shape[0]):
-            for j in range(grid_shape[1]):
-                state = (i, j)
-                if state in v:
-                    # Determinar el color del texto basado en el valor
-                    text_color = 'white' if abs(v[state]) > 50 or v[state] < -0.5 else 'black'
-                    
-                    # Formatear el texto según la magnitud del valor
-                    if abs(v[state]) < 10:
-                        text = f"{v[state]:.2f}"
-                    else:
-                        text = f"{v[state]:.1f}"
-                    
-                    ax.text(j, i, text, 
-                        ha="center", va="center", 
-                        color=text_color,
-                        fontsize=9)
+        # Una sola imagen; los textos se crean solo para las celdas visibles cuando son legibles
+        im, _ = self.draw_heatmap(heatmap_data, ax, vmin, vmax, max_annotated_cells)
         
         # Añadir una barra de color
         cbar = plt.colorbar(im, ax=ax)
         cbar.set_label('Valor de estado')
         
-        # Añadir líneas de cuadrícula
+        # Líneas de cuadrícula solo en rejillas pequeñas (una línea por celda)
+        grid_shape = heatmap_data.shape
         ax.grid(False)
-        ax.set_xticks(np.arange(-0.5, grid_shape[1], 1), minor=True)
-        ax.set_yticks(np.arange(-0.5, grid_shape[0], 1), minor=True)
-        ax.grid(which="minor", color="black", linestyle='-', linewidth=1)
-        
-        # Eliminar los ticks del eje
-        ax.set_xticks([])
-        ax.set_yticks([])
+        if heatmap_data.size <= max_annotated_cells:
+            ax.set_xticks(np.arange(-0.5, grid_shape[1], 1), minor=True)
+            ax.set_yticks(np.arange(-0.5, grid_shape[0], 1), minor=True)
+            ax.grid(which="minor", color="black", linestyle='-', linewidth=1)
+            ax.tick_params(which="minor", length=0)
         
-        # Agregar coordenadas a los bordes
-        for i in range(grid_shape[0]):
-            ax.text(-0.3, i, str(i), ha='right', va='center')
-        for j in range(grid_shape[1]):
-            ax.text(j, -0.3, str(j), ha='center', va='top')
+        # Coordenadas de filas y columnas como etiquetas de los ejes (el localizador elige cuántas mostrar)
+        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+        ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+        ax.xaxis.tick_top()
         
         # Añadir título si se proporciona
         if title:
             ax.set_title(title)
         
-        return ax
\ No newline at end of file
+        return ax
+
+
+class CellAnnotations:
+    """
+    Textos con el valor de cada celda de un heatmap. Solo existen mientras el zoom deja a la vista como mucho
+    `max_cells` celdas, y se vuelven a crear cuando cambian los límites de los ejes.
+    """
+
+    def __init__(self, ax, grid, max_cells=400, animated=False):
+        """
+        :param ax: axis object of the heatmap
+        :param grid: array (m, n) with the values of the cells
+        :param max_cells: maximum number of visible cells for which values are written
+        :param animated: True if the texts are redrawn with blitting
+        """
+        self.ax = ax
+        self.grid = grid
+        self.max_cells = max_cells
+        self.animated = animated
+        self.texts = []
+        self._cells = None  # (filas, columnas) de las celdas anotadas
+        # funciones en lugar de métodos: matplotlib solo guarda referencias débiles a los métodos ligados
+        ax.callbacks.connect('xlim_changed', lambda ax: self._on_limits_changed(ax))
+        ax.callbacks.connect('ylim_changed', lambda ax: self._on_limits_changed(ax))
+        self._on_limits_changed(ax)
+
+    def _visible_window(self):
+        """
+        :return: rangos (filas, columnas) de las celdas visibles con los límites actuales de los ejes
+        """
+        m, n = self.grid.shape
+        x0, x1 = sorted(self.ax.get_xlim())
+        y0, y1 = sorted(self.ax.get_ylim())
+        rows = range(max(0, int(np.ceil(y0 - 0.5))), min(m, int(np.floor(y1 + 0.5)) + 1))
+        cols = range(max(0, int(np.ceil(x0 - 0.5))), min(n, int(np.floor(x1 + 0.5)) + 1))
+        return rows, cols
+
+    def _on_limits_changed(self, ax):
+        for text in self.texts:
+            text.remove()
+        self.texts = []
+        rows, cols = self._visible_window()
+        if len(rows) * len(cols) > self.max_cells:
+            self._cells = None
+            return
+        self._cells = tuple(np.meshgrid(np.array(rows), np.array(cols), indexing='ij'))
+        for i, j in zip(self._cells[0].ravel().tolist(), self._cells[1].ravel().tolist()):
+            self.texts.append(self.ax.text(j, i, "", ha="center", va="center", fontsize=9, animated=self.animated))
+        self._update_texts()
+
+    def _update_texts(self):
+        if self._cells is None:
+            return
+        values = self.grid[self._cells].ravel()
+        for text, value in zip(self.texts, values.tolist()):
+            # Determinar el color del texto basado en el valor y formatear según la magnitud
+            text.set_color('white' if abs(value) > 50 or value < -0.5 else 'black')
+            text.set_text(f"{value:.2f}" if abs(value) < 10 else f"{value:.1f}")
+
+    def set_data(self, grid):
+        """
+        :param grid: array (m, n) with the new values of the cells
+        :return: list of the text artists that changed
+        """
+        self.grid = grid
+        self._update_texts()
+        return self.texts
@@ -0,0 +1,207 @@
+"""
+Benchmark del pipeline de policy iteration
+- Genera lagos desde 4x4 hasta 500x500 (o los tamaños indicados)
+- Mide por separado cada fase: construcción del LakeMDP, forma cerrada, reset del evaluador, q, improve y run completo
+- Registra el pico de memoria de cada fase y guarda los resultados en JSON o CSV
+
+Uso: python benchmark.py --sizes 4 10 100 500 --backends sparse incremental --output results.json
+"""
+
+import argparse
+import csv
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from mdp import get_closed_form_of_mdp, get_compiled_form_of_mdp, get_random_policy
+from lake import LakeMDP
+from large_lake import large_lake_world
+from policy_evaluation import LinearSystemEvaluator, IterativePolicyEvaluator, SCCPolicyEvaluator
+from policy_improvement._standard import StandardPolicyImprover
+from policy_iteration import StandardPolicyIteration, ModifiedPolicyIteration
+from value_iteration import StandardValueIteration
+
+DEFAULT_SIZES = [4, 10, 50, 100, 200, 500]
+
+# evaluadores que se comparan; "dense" solo se usa hasta `max_dense_states` estados
+BACKENDS = {
+    "dense": lambda mdp, gamma: LinearSystemEvaluator(mdp, gamma),
+    "sparse": lambda mdp, gamma: LinearSystemEvaluator(mdp, gamma, sparse=True),
+    "incremental": lambda mdp, gamma: LinearSystemEvaluator(mdp, gamma, sparse=True, incremental=True),
+    "gmres": lambda mdp, gamma: IterativePolicyEvaluator(mdp, gamma, method="gmres"),
+    "scc": lambda mdp, gamma: SCCPolicyEvaluator(mdp, gamma),
+}
+
+DEFAULT_BACKENDS = ["dense", "sparse", "incremental"]
+
+FIELDS = ["size", "n_states", "backend", "phase", "seconds", "peak_memory_mb", "iterations"]
+
+
+def generate_lake_world(size, hole_density=0.1, seed=0):
+    """
+    Genera el mundo de un lago cuadrado. Los tamaños 4 y 10 usan los lagos del proyecto.
+
+    :param size: número de filas y columnas
+    :param hole_density: probabilidad de que una celda sea un agujero
+    :param seed: semilla para colocar los agujeros
+    :return: array (size x size) con 1 en los agujeros
+    """
+    if size == 4:
+        return LakeMDP().world
+    if size == 10:
+        return large_lake_world
+    rs = np.random.RandomState(seed)
+    world = (rs.random_sample((size, size)) < hole_density).astype(int)
+    world[0, 0] = 0
+    world[-1, -1] = 0
+    return world
+
+
+def measure(fn, track_memory=True):
+    """
+    :param fn: función sin argumentos que se mide
+    :param track_memory: si es True, se registra el pico de memoria con tracemalloc (añade algo de sobrecoste)
+    :return: tripla (resultado de fn, segundos, pico de memoria en MB o None)
+    """
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = None
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def benchmark_size(size, backends, gamma=0.95, max_iter=1000, max_dense_states=2500, track_memory=True, seed=0):
+    """
+    Ejecuta todas las fases para un tamaño de lago.
+
+    :param size: número de filas y columnas del lago
+    :param backends: nombres de los evaluadores de `BACKENDS` que se comparan
+    :param gamma: factor de descuento
+    :param max_iter: número máximo de iteraciones de cada solver
+    :param max_dense_states: número máximo de estados para el evaluador denso
+    :param track_memory: si es True, se registra el pico de memoria de cada fase
+    :param seed: semilla del mundo y de la política inicial
+    :return: lista de registros (diccionarios con las claves de `FIELDS`)
+    """
+    records = []
+    world = generate_lake_world(size, seed=seed)
+    n_states = world.size
+
+    def record(backend, phase, fn, iterations=None):
+        result, seconds, peak = measure(fn, track_memory)
+        records.append({
+            "size": size, "n_states": n_states, "backend": backend, "phase": phase, "seconds": seconds,
+            "peak_memory_mb": peak, "iterations": iterations(result) if iterations else None
+        })
+        print(f"  {size}x{size} {backend:>12} {phase:<16} {seconds:9.4f} s")
+        return result
+
+    mdp = record("-", "construction", lambda: LakeMDP(world=world))
+    record("-", "compile", lambda: get_compiled_form_of_mdp(mdp))
+    record("-", "closed_form", lambda: get_closed_form_of_mdp(mdp))
+
+    for backend in backends:
+        if backend == "dense" and n_states > max_dense_states:
+            continue
+        make_evaluator = BACKENDS[backend]
+        # el evaluador y la política se construyen fuera de la fase medida; q_array se mide antes que q, que lo usa
+        evaluator, policy = make_evaluator(mdp, gamma), get_random_policy(mdp, seed=seed)
+        record(backend, "reset", lambda: evaluator.reset(policy))
+        q_array = record(backend, "q_array", lambda: evaluator.q_array)
+        record(backend, "q", lambda: evaluator.q)
+        improver = StandardPolicyImprover(mdp=mdp)
+        improver.reset(policy)
+        record(backend, "improve", lambda: improver.improve(q_array))
+        # se mide `run` de principio a fin; la construcción (que ya evalúa la política inicial) queda fuera
+        policy_iteration = StandardPolicyIteration(
+            get_random_policy(mdp, seed=seed), make_evaluator(mdp, gamma), StandardPolicyImprover(mdp=mdp)
+        )
+        record(backend, "policy_iteration", lambda: policy_iteration.run(max_iter),
+               iterations=lambda _: policy_iteration.iteration)
+
+    modified_pi = ModifiedPolicyIteration(
+        get_random_policy(mdp, seed=seed), IterativePolicyEvaluator(mdp, gamma, method="jacobi"),
+        StandardPolicyImprover(mdp=mdp), k=5
+    )
+    record("jacobi", "modified_pi", lambda: modified_pi.run(max_iter), iterations=lambda _: modified_pi.iteration)
+    value_iteration = StandardValueIteration(mdp, gamma)
+    record("-", "value_iteration", lambda: value_iteration.run(max_iter), iterations=lambda _: value_iteration.iterations)
+    return records
+
+
+def write_results(records, path):
+    """
+    :param records: registros devueltos por `benchmark_size`
+    :param path: fichero de salida; se escribe CSV si termina en .csv y JSON en otro caso
+    """
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        with open(path, "w") as f:
+            json.dump(records, f, indent=2)
+
+
+def compare_with_baseline(records, baseline_path, tolerance=1.5):
+    """
+    Compara los tiempos con un fichero JSON de resultados anteriores.
+
+    :param records: registros actuales
+    :param baseline_path: fichero JSON escrito por `write_results`
+    :param tolerance: factor a partir del cual una fase se considera una regresión
+    :return: lista de (tamaño, backend, fase, factor) de las fases más lentas que la referencia
+    """
+    with open(baseline_path) as f:
+        baseline = {(r["size"], r["backend"], r["phase"]): r["seconds"] for r in json.load(f)}
+    regressions = []
+    for r in records:
+        key = (r["size"], r["backend"], r["phase"])
+        if key in baseline and baseline[key] > 0 and r["seconds"] / baseline[key] > tolerance:
+            regressions.append(key + (r["seconds"] / baseline[key],))
+    return regressions
+
+
+def main():
+    """Función principal del benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de policy iteration en lagos de distinto tamaño")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--backends", nargs="+", default=DEFAULT_BACKENDS, choices=list(BACKENDS))
+    parser.add_argument("--gamma", type=float, default=0.95)
+    parser.add_argument("--max-iter", type=int, default=1000)
+    parser.add_argument("--max-dense-states", type=int, default=2500)
+    parser.add_argument("--no-memory", action="store_true", help="no registrar el pico de memoria (tiempos sin sobrecoste)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="fichero JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    args = parser.parse_args()
+
+    records = []
+    for size in args.sizes:
+        print(f"\n=== Lago {size}x{size} ===")
+        records += benchmark_size(
+            size, args.backends, args.gamma, args.max_iter, args.max_dense_states, not args.no_memory, args.seed
+        )
+
+    write_results(records, args.output)
+    print(f"\nResultados guardados en {args.output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(records, args.baseline, args.tolerance)
+        for size, backend, phase, factor in regressions:
+            print(f"Regresión: {size}x{size} {backend} {phase} es {factor:.2f} veces más lento")
+        if not regressions:
+            print("Sin regresiones respecto a la referencia.")
+
+
+if __name__ == "__main__":
+    main()
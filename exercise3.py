@@ -54,15 +54,8 @@ def run_policy_iteration_analysis(mdp, analyzer, direction, gamma=0.95, max_iter
     # Crear política inicial direccional
     init_policy = create_directional_policy(mdp, direction)
     
-    # Iniciar un nuevo run en el analizador
-    analyzer.new_run(direction)
-    
     # Crear evaluador de política
     evaluator = LinearSystemEvaluator(mdp, gamma)
-    evaluator.reset(init_policy)
-    
-    # Registrar valores de estado iniciales
-    analyzer.add_state_value_estimates(evaluator.v)
     
     # Crear mejorador de política
     improver = StandardPolicyImprover()
@@ -70,14 +63,10 @@ def run_policy_iteration_analysis(mdp, analyzer, direction, gamma=0.95, max_iter
     # Crear algoritmo de iteración de políticas
     policy_iteration = StandardPolicyIteration(init_policy, evaluator, improver)
     
-    # Ejecutar iteraciones y registrar valores de estado
-    for i in range(max_iter):
-        improved = policy_iteration.step()
-        analyzer.add_state_value_estimates(evaluator.v)
-        
-        if not improved:
-            print(f"  Política convergió en {i+1} iteraciones")
-            break
+    # Registrar los valores de estado (iniciales y tras cada iteración) a medida que se generan
+    last = analyzer.record_run(direction, policy_iteration.iterate(max_iter))
+    if last.improved is False:
+        print(f"  Política convergió en {last.iteration} iteraciones")
     
     return policy_iteration.policy_improver.policy
 
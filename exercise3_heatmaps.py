@@ -31,54 +31,46 @@ def create_directional_policy(mdp, direction):
     
     return policy
 
-def run_policy_iterations(mdp, policy_name, init_policy, gamma=0.95, max_iter=10):
+def run_policy_iterations(mdp, analyzer, policy_name, init_policy, gamma=0.95, max_iter=10):
     """
-    Ejecuta iteración de políticas y devuelve los valores de estado en cada iteración
+    Ejecuta iteración de políticas y registra en `analyzer` los valores de estado de cada iteración
+
+    :return: array (iteraciones x estados) con la historia de valores de estado
     """
     print(f"Ejecutando Policy Iteration para política inicial: {policy_name}")
     
-    # Lista para almacenar los valores de estado en cada iteración
-    state_values_history = []
-    
-    # Crear evaluador
+    # Crear evaluador, mejorador e iterador de política
     evaluator = LinearSystemEvaluator(mdp, gamma)
-    evaluator.reset(init_policy)
-    
-    # Guardar valores iniciales
-    state_values_history.append(evaluator.v.copy())
-    
-    # Crear mejorador e iterador de política
     improver = StandardPolicyImprover()
     policy_iteration = StandardPolicyIteration(init_policy, evaluator, improver)
     
-    # Ejecutar iteraciones
-    for i in range(max_iter):
-        improved = policy_iteration.step()
-        
-        # Guardar valores de estado después de este paso
-        state_values_history.append(evaluator.v.copy())
-        
-        if not improved:
-            print(f"  Política convergió en {i+1} iteraciones")
-            break
+    # Guardar los valores de estado iniciales y los de cada paso a medida que se generan
+    last = analyzer.record_run(policy_name, policy_iteration.iterate(max_iter))
+    if last.improved is False:
+        print(f"  Política convergió en {last.iteration} iteraciones")
     
-    return state_values_history
+    return analyzer.get_state_values(policy_name)
 
-def interactive_heatmap_display(mdp, lake_name):
+def interactive_heatmap_display(mdp, lake_name, max_annotated_cells=400):
     """
     Muestra una visualización interactiva de los heatmaps para todas las políticas
     direccionales, permitiendo navegar por las iteraciones
+
+    Cada heatmap es una única imagen que se actualiza en el sitio con blitting; los valores de las celdas solo se
+    escriben cuando el zoom deja a la vista como mucho `max_annotated_cells` celdas.
     """
-    # Ejecutar policy iteration para cada dirección y almacenar resultados
+    # Ejecutar policy iteration para cada dirección y precalcular las cuadrículas de todos los frames
     directions = ['u', 'r', 'd', 'l']
-    policy_results = {}
+    analyzer = Analyzer(mdp)
+    frames = {}
     
     for direction in directions:
         init_policy = create_directional_policy(mdp, direction)
-        policy_results[direction] = run_policy_iterations(mdp, direction, init_policy)
+        history = run_policy_iterations(mdp, analyzer, direction, init_policy)
+        frames[direction] = analyzer.to_grids(history)
     
     # Determinar el número máximo de iteraciones para todas las políticas
-    max_iterations = max(len(values) for values in policy_results.values())
+    max_iterations = max(len(grids) for grids in frames.values())
     
     # Crear la figura principal
     fig = plt.figure(figsize=(18, 12))
@@ -88,77 +80,43 @@ def interactive_heatmap_display(mdp, lake_name):
     gs = gridspec.GridSpec(2, 2)
     
     # Crear los subplots para cada dirección
-    axes = {}
     images = {}
+    annotations = {}
+    iteration_texts = {}
     for i, direction in enumerate(directions):
         ax = fig.add_subplot(gs[i // 2, i % 2])
         ax.set_title(f"Política inicial: {direction}")
         
-        # Crear una matriz para el mapa de calor
-        grid_shape = mdp.world.shape
-        heatmap_data = np.zeros(grid_shape)
-        
-        # Inicializar el heatmap con valores vacíos
-        img = ax.imshow(heatmap_data, cmap='coolwarm')
-        plt.colorbar(img, ax=ax)
+        # Escala de color fija para toda la ejecución (la barra de color no se redibuja con blitting)
+        grids = frames[direction]
+        images[direction], annotations[direction] = analyzer.draw_heatmap(
+            grids[0], ax, vmin=grids.min(), vmax=grids.max(), max_annotated_cells=max_annotated_cells, animated=True
+        )
+        plt.colorbar(images[direction], ax=ax)
         
-        # Guardar referencias
-        axes[direction] = ax
-        images[direction] = img
+        # Texto para mostrar la iteración actual (dentro de los ejes para que entre en el blitting)
+        iteration_texts[direction] = ax.text(
+            0.01, 0.99, "Iteración: 0", transform=ax.transAxes, ha='left', va='top', fontsize=12,
+            bbox=dict(facecolor='white', alpha=0.8), animated=True
+        )
         
         # Quitar los ticks
         ax.set_xticks([])
         ax.set_yticks([])
     
-    # Texto para mostrar la iteración actual
-    iteration_text = fig.text(0.5, 0.05, "Iteración: 0", ha='center', fontsize=14)
-    
-    # Función de actualización para la animación
+    # Función de actualización para la animación: solo cambia los datos de las imágenes y de los textos visibles
     def update(iteration):
-        iteration_text.set_text(f"Iteración: {iteration}")
-        
+        artists = []
         for direction in directions:
-            # Asegurarse de que tenemos datos para esta iteración
-            if iteration < len(policy_results[direction]):
-                state_values = policy_results[direction][iteration]
-                
-                # Actualizar la matriz del heatmap
-                grid_shape = mdp.world.shape
-                heatmap_data = np.zeros(grid_shape)
-                
-                # Llenar la matriz con los valores de estado
-                for s in state_values:
-                    if isinstance(s, tuple) and len(s) == 2:
-                        r, c = s
-                        if 0 <= r < grid_shape[0] and 0 <= c < grid_shape[1]:
-                            heatmap_data[r, c] = state_values[s]
-                
-                # Actualizar el heatmap
-                images[direction].set_array(heatmap_data)
-                images[direction].set_clim(vmin=np.min(heatmap_data), vmax=np.max(heatmap_data))
-                
-                # Actualizar los textos de valores
-                for texts in getattr(axes[direction], '_texts', []):
-                    texts.remove()
-                axes[direction]._texts = []
-                
-                for i in range(grid_shape[0]):
-                    for j in range(grid_shape[1]):
-                        state = (i, j)
-                        if state in state_values:
-                            text_color = 'white' if abs(state_values[state]) > 50 else 'black'
-                            text = axes[direction].text(j, i, f"{state_values[state]:.1f}", 
-                                                      ha="center", va="center", 
-                                                      color=text_color,
-                                                      fontsize=8)
-                            if not hasattr(axes[direction], '_texts'):
-                                axes[direction]._texts = []
-                            axes[direction]._texts.append(text)
-        
-        return [images[d] for d in directions] + [iteration_text]
+            grids = frames[direction]
+            grid = grids[min(iteration, len(grids) - 1)]
+            images[direction].set_data(grid)
+            iteration_texts[direction].set_text(f"Iteración: {iteration}")
+            artists += [images[direction], iteration_texts[direction]] + annotations[direction].set_data(grid)
+        return artists
     
     # Crear animación
-    ani = FuncAnimation(fig, update, frames=range(max_iterations), interval=1000, blit=False)
+    ani = FuncAnimation(fig, update, frames=range(max_iterations), interval=1000, blit=True)
     
     # Mostrar controles para navegar por las iteraciones
     plt.tight_layout(rect=[0, 0.07, 1, 0.95])
@@ -6,32 +6,17 @@ Visualización de la función de ventaja para el problema del lago
 import matplotlib.pyplot as plt
 import numpy as np
 import os
-import matplotlib.gridspec as gridspec
+from concurrent.futures import ThreadPoolExecutor
 from matplotlib.colors import LinearSegmentedColormap
-import io
 from PIL import Image
 
-from mdp import get_random_policy
+from mdp import get_compiled_form_of_mdp, get_random_policy
 from lake import LakeMDP
 from large_lake import large_lake_world
 from policy_evaluation._linear import LinearSystemEvaluator
 from policy_improvement._standard import StandardPolicyImprover
 from policy_iteration._standard import StandardPolicyIteration
 
-def calculate_advantage_function(mdp, v, q):
-    """
-    Calcula la función de ventaja A(s,a) = Q(s,a) - V(s) para todos los estados y acciones
-    """
-    advantage = {}
-    for s in v:
-        if mdp.is_terminal_state(s):
-            continue
-        advantage[s] = {}
-        for a in mdp.get_actions_in_state(s):
-            if s in q and a in q[s]:
-                advantage[s][a] = q[s][a] - v[s]
-    return advantage
-
 def create_directional_policy(mdp, direction):
     """
     Crea una política que siempre elige la dirección especificada cuando sea posible.
@@ -47,74 +32,121 @@ def create_directional_policy(mdp, direction):
     
     return policy
 
-def create_advantage_grid_visualization(mdp, advantage, iteration, max_adv=10):
+# posición de cada acción dentro del bloque 3x3 de su celda
+ACTION_OFFSETS = {"u": (0, 1), "r": (1, 2), "d": (2, 1), "l": (1, 0)}
+
+def build_advantage_mosaic(mdp, advantage):
     """
-    Crea una visualización en forma de grid para la función de ventaja
-    siguiendo exactamente el formato requerido por el ejercicio 4
+    Coloca las ventajas en un mosaico (3·filas) x (3·columnas): cada celda del lago es un bloque 3x3 con la ventaja
+    de cada acción en la dirección correspondiente y NaN (blanco) en el resto
+
+    :param mdp: el LakeMDP
+    :param advantage: array S x A con las ventajas A(s,a) = Q(s,a) - V(s)
+    :return: array (3·filas, 3·columnas)
     """
     rows, cols = mdp.world.shape
-    fig = plt.figure(figsize=(16, 16))
-    
-    # Título general
-    fig.suptitle(f"Advantages after {iteration} iterations.", fontsize=20, y=0.98)
-    
-    # Crear un grid para organizar los subplots
-    outer_grid = gridspec.GridSpec(rows, cols, figure=fig, wspace=0.4, hspace=0.4)
-    
-    # Definir un colormap personalizado: rojo para ventajas negativas, azul para positivas
-    colors = [(0.7, 0, 0), (1, 1, 1), (0, 0, 0.7)]  # Rojo, Blanco, Azul
-    cmap = LinearSegmentedColormap.from_list('custom_diverging', colors, N=256)
-    
-    # Iterar sobre cada estado (celda de la cuadrícula)
-    for r in range(rows):
-        for c in range(cols):
-            state = (r, c)
-            
-            # Saltarse estados terminales o que no están en advantage
-            if mdp.is_terminal_state(state) or state not in advantage:
-                continue
-            
-            # Crear una subgráfica para este estado
-            ax = fig.add_subplot(outer_grid[r, c])
-            
-            # Crear una matriz 3x3 para las ventajas
-            advantage_matrix = np.zeros((3, 3))
-            advantage_matrix.fill(np.nan)  # NaN se mostrará como blanco
-            
-            # Llenar la matriz con los valores de ventaja
-            for a, adv in advantage[state].items():
-                if a == "u":
-                    advantage_matrix[0, 1] = adv
-                elif a == "r":
-                    advantage_matrix[1, 2] = adv
-                elif a == "d":
-                    advantage_matrix[2, 1] = adv
-                elif a == "l":
-                    advantage_matrix[1, 0] = adv
-            
-            # Visualizar la matriz como un mapa de calor
-            im = ax.imshow(advantage_matrix, cmap=cmap, vmin=-max_adv, vmax=max_adv)
-            
-            # Configurar aspecto
-            ax.set_xticks([])
-            ax.set_yticks([])
-            ax.set_frame_on(True)
-    
-    # Añadir barras de escala en la derecha
-    cbar_ax = fig.add_axes([0.92, 0.15, 0.02, 0.7])
-    cbar = fig.colorbar(im, cax=cbar_ax)
-    cbar.set_label('Advantage')
-    # Añadir ticks
-    cbar.set_ticks([-10, 0, 10])
-    cbar.set_ticklabels(['-10', '0', '10'])
-    
-    plt.tight_layout(rect=[0, 0, 0.9, 0.95])
-    return fig
+    compiled = get_compiled_form_of_mdp(mdp)
+    mosaic = np.full((rows, 3, cols, 3), np.nan)
+    for a, (dr, dc) in ACTION_OFFSETS.items():
+        mosaic[:, dr, :, dc] = advantage[:, compiled.action_index[a]].reshape(rows, cols)
+    return mosaic.reshape(3 * rows, 3 * cols)
+
+class AdvantageMosaicRenderer:
+    """
+    Figura única con el mosaico de ventajas; en cada iteración solo se cambian los datos de la imagen y el título
+    """
+
+    def __init__(self, mdp, max_adv=10, figsize=(16, 16), dpi=100):
+        rows, cols = mdp.world.shape
+        self.fig = plt.figure(figsize=figsize, dpi=dpi)
+        self.title = self.fig.suptitle("", fontsize=20, y=0.98)
+        ax = self.fig.add_axes([0.05, 0.05, 0.82, 0.88])
+        
+        # Definir un colormap personalizado: rojo para ventajas negativas, azul para positivas
+        colors = [(0.7, 0, 0), (1, 1, 1), (0, 0, 0.7)]  # Rojo, Blanco, Azul
+        cmap = LinearSegmentedColormap.from_list('custom_diverging', colors, N=256)
+        self.image = ax.imshow(np.full((3 * rows, 3 * cols), np.nan), cmap=cmap, vmin=-max_adv, vmax=max_adv,
+                               interpolation='nearest')
+        
+        # Separar las celdas del lago con líneas cada 3 píxeles del mosaico
+        ax.set_xticks(np.arange(-0.5, 3 * cols, 3), minor=True)
+        ax.set_yticks(np.arange(-0.5, 3 * rows, 3), minor=True)
+        ax.grid(which="minor", color="black", linestyle='-', linewidth=1)
+        ax.tick_params(which="both", length=0)
+        ax.set_xticks([])
+        ax.set_yticks([])
+        
+        # Añadir barras de escala en la derecha
+        cbar_ax = self.fig.add_axes([0.9, 0.15, 0.02, 0.7])
+        cbar = self.fig.colorbar(self.image, cax=cbar_ax)
+        cbar.set_label('Advantage')
+        cbar.set_ticks([-max_adv, 0, max_adv])
+        cbar.set_ticklabels([str(-max_adv), '0', str(max_adv)])
+
+    def render(self, mosaic, iteration):
+        """
+        :return: array RGB (alto x ancho x 3) con el frame dibujado
+        """
+        self.image.set_data(mosaic)
+        self.title.set_text(f"Advantages after {iteration} iterations.")
+        self.fig.canvas.draw()
+        return np.array(self.fig.canvas.buffer_rgba())[..., :3]
+
+    def close(self):
+        plt.close(self.fig)
+
+class BackgroundGifWriter:
+    """
+    Codifica y escribe los frames en un hilo aparte mientras el proceso principal calcula la siguiente iteración
+    """
+
+    def __init__(self, gif_path, duration=1000):
+        self.gif_path = gif_path
+        self.duration = duration
+        self.frames = []
+        self._executor = ThreadPoolExecutor(max_workers=1)  # un solo hilo: los frames se escriben en orden
+        self._pending = []  # futures de los frames en cola; sus errores se relanzan en close()
+
+    def _encode(self, pixels, png_path):
+        image = Image.fromarray(pixels)
+        if png_path is not None:
+            image.save(png_path)
+        self.frames.append(image.quantize(colors=256))
+
+    def add_frame(self, pixels, png_path=None):
+        """
+        :param pixels: array RGB del frame (no se modifica después de llamar a este método)
+        :param png_path: fichero opcional donde se guarda también el frame como PNG
+        """
+        self._pending.append(self._executor.submit(self._encode, pixels, png_path))
+
+    def close(self):
+        """Espera a que se codifiquen todos los frames y guarda el GIF (relanza el primer error de la codificación)"""
+        try:
+            for future in self._pending:
+                future.result()
+            self._executor.submit(self._save).result()
+        finally:
+            self._pending = []
+            self._executor.shutdown()
+
+    def _save(self):
+        self.frames[0].save(
+            self.gif_path,
+            save_all=True,
+            append_images=self.frames[1:],
+            optimize=False,
+            duration=self.duration,  # 1 segundo por frame
+            loop=0  # 0 = loop infinito
+        )
 
 def run_policy_iteration_with_advantage_visualization(mdp, lake_name="standard", output_dir="advantage_images", gamma=0.95, max_iter=6):
     """
     Ejecuta iteración de políticas y genera visualizaciones de la función de ventaja
     para cada iteración, guardando las imágenes para crear un GIF.
+
+    Cada frame se dibuja una sola vez en una figura reutilizada; la codificación del PNG y del GIF ocurre en un hilo
+    en segundo plano mientras se calcula la siguiente iteración.
     """
     print(f"\n=== Ejecutando Policy Iteration para {lake_name} Lake y visualizando función de ventaja ===")
     
@@ -126,62 +158,36 @@ def run_policy_iteration_with_advantage_visualization(mdp, lake_name="standard",
     
     # Crear evaluador
     evaluator = LinearSystemEvaluator(mdp, gamma)
-    evaluator.reset(init_policy)
     
     # Crear mejorador e iterador de política
-    improver = StandardPolicyImprover()
+    improver = StandardPolicyImprover(mdp=mdp)
     policy_iteration = StandardPolicyIteration(init_policy, evaluator, improver)
     
-    # Lista para almacenar los frames
-    frames = []
+    gif_path = f"{lake_name}_advantage_evolution.gif"
+    renderer = AdvantageMosaicRenderer(mdp)
+    writer = BackgroundGifWriter(gif_path)
     
-    # Generar visualización para cada iteración
-    for i in range(max_iter + 1):  # +1 para incluir la iteración 0
+    # Generar visualización para cada iteración (la 0 es la de la política inicial)
+    for snapshot in policy_iteration.iterate(max_iter, include_q=True):
+        i = snapshot.iteration
         print(f"  Procesando iteración {i}...")
         
-        # Calcular función de ventaja
-        v = evaluator.v
-        q = evaluator.q
-        advantage = calculate_advantage_function(mdp, v, q)
-        
-        # Crear figura para esta iteración
-        fig = create_advantage_grid_visualization(mdp, advantage, i)
-        
-        # Guardar la figura como imagen
+        # Dibujar el mosaico con las ventajas de la iteración
         output_path = f"{output_dir}/{lake_name}_advantage_iter{i}.png"
-        fig.savefig(output_path, dpi=100, bbox_inches='tight')
-        print(f"    Imagen guardada: {output_path}")
+        writer.add_frame(renderer.render(build_advantage_mosaic(mdp, snapshot.advantages), i), output_path)
+        print(f"    Imagen en cola: {output_path}")
         
-        # Convertir figura a imagen para el GIF
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', dpi=100)
-        buf.seek(0)
-        img = Image.open(buf)
-        frames.append(img)
-        
-        plt.close(fig)
-        
-        # Ejecutar un paso de iteración de política si no es la última iteración
-        if i < max_iter:
-            improved = policy_iteration.step()
-            if not improved:
-                print(f"    La política convergió en {i+1} iteraciones")
-                break
+        if snapshot.improved is False:
+            print(f"    La política convergió en {i} iteraciones")
+    
+    renderer.close()
     
     # Guardar como GIF
-    gif_path = f"{lake_name}_advantage_evolution.gif"
     print(f"Guardando GIF en {gif_path}...")
-    frames[0].save(
-        gif_path,
-        save_all=True,
-        append_images=frames[1:],
-        optimize=False,
-        duration=1000,  # 1 segundo por frame
-        loop=0  # 0 = loop infinito
-    )
+    writer.close()
     
     print(f"GIF generado correctamente: {gif_path}")
-    return gif_path, frames
+    return gif_path, writer.frames
 
 def main():
     """Función principal"""
@@ -1,5 +1,7 @@
 import numpy as np
-from mdp import MDP
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from mdp import MDP, CompiledMDP, get_compiled_form_of_mdp
 import itertools as it
 
 
@@ -26,96 +28,98 @@ class LakeMDP(MDP):
 
         # create states
         states = [(r, c) for r, c in it.product(range(m), range(n))]
-        self.vworld = [world[r, c] for r, c in states]  # vectorized version of the world
+        self.vworld = world.ravel().tolist()  # vectorized version of the world
 
         # create actions
         actions = ["u", "r", "d", "l"]
 
-        # create transition probabilities
-        transition_probas = {}
-
-        def add_probability(s, a, s_prime, p):
-            if s_prime not in transition_probas[s][a]:
-                transition_probas[s][a][s_prime] = 0
-            transition_probas[s][a][s_prime] += np.round(p, 4)
-
-        def get_state_after_move(s, m):
-            r, c = s
-            if m == "u":
-                return r - 1 if r > 0 else r, c
-            if m == "r":
-                return r, c + 1 if c < n - 1 else c
-            if m == "d":
-                return r + 1 if r < n - 1 else r, c
-            if m == "l":
-                return r, c - 1 if c > 0 else c
-
-        def check_distribution(s=None, a=None):
-            if s is not None and a is not None:
-                if sum(transition_probas[s][a].values()) != 1:
-                    raise ValueError(
-                        f"Posterior for state {s} and action {a} is {transition_probas[s][a]}, which sums up to {sum(transition_probas[s][a].values())} instead of 1.")
-            elif s is None:
-                for s in transition_probas:
-                    check_distribution(s, a)
-            elif a is None:
-                for a in transition_probas[s]:
-                    check_distribution(s, a)
-            else:
-                raise Exception("This point should never be reached!")
-
-        for s in states:
-            r, c = s  # unpack state into row and column
-            is_goal_state = r == n - 1 and c == m - 1
-            is_hole = world[r, c] == 1
-
-            if not is_goal_state and not is_hole:
-                transition_probas[s] = {}
-                for a in actions:
-                    transition_probas[s][a] = {}
-
-                    # if top is intended
-                    if a == "u":
-                        add_probability(s, a, get_state_after_move(s, "u"), probability_of_success)
-                        add_probability(s, a, get_state_after_move(s, "l"), (1 - probability_of_success) * 0.5)
-                        add_probability(s, a, get_state_after_move(s, "r"), (1 - probability_of_success) * 0.5)
-
-                    # if right is intended
-                    if a == "r":
-                        add_probability(s, a, get_state_after_move(s, "r"), probability_of_success)
-                        add_probability(s, a, get_state_after_move(s, "u"), (1 - probability_of_success) * 0.5)
-                        add_probability(s, a, get_state_after_move(s, "d"), (1 - probability_of_success) * 0.5)
-
-                    # if bottom is intended
-                    if a == "d":
-                        add_probability(s, a, get_state_after_move(s, "d"), probability_of_success)
-                        add_probability(s, a, get_state_after_move(s, "l"), (1 - probability_of_success) * 0.5)
-                        add_probability(s, a, get_state_after_move(s, "r"), (1 - probability_of_success) * 0.5)
-
-                    # if left is intended
-                    if a == "l":
-                        add_probability(s, a, get_state_after_move(s, "l"), probability_of_success)
-                        add_probability(s, a, get_state_after_move(s, "u"), (1 - probability_of_success) * 0.5)
-                        add_probability(s, a, get_state_after_move(s, "d"), (1 - probability_of_success) * 0.5)
-
-        # just make sure that every posterior adds up to one
-        check_distribution()
+        # intended move with `probability_of_success`, each perpendicular move with half the rest
+        self.slips = {"u": ("l", "r"), "r": ("u", "d"), "d": ("l", "r"), "l": ("u", "d")}
+        self.move_probabilities = (
+            float(np.round(probability_of_success, 4)), float(np.round((1 - probability_of_success) * 0.5, 4))
+        )
+
+        # just make sure that every posterior adds up to one (moves blocked by a wall keep their mass, so one check suffices)
+        total = self.move_probabilities[0] + 2 * self.move_probabilities[1]
+        if abs(total - 1) > 1e-9:
+            raise ValueError(
+                f"Posterior for probability_of_success={probability_of_success} sums up to {total} instead of 1.")
+
+        is_hole = world.ravel() == 1
+        is_goal = np.arange(m * n) == m * n - 1
 
         # reward function. i-th position contains reward for state in i-th position of states variable.
-        rewards = {}
-        for s, is_hole in zip(states, self.vworld):
-            if is_hole:
-                rewards[s] = penalty_for_hole
-            elif s == (n - 1, m - 1):
-                rewards[s] = reward_for_goal
-            else:
-                rewards[s] = standard_reward
+        reward_array = np.where(is_hole, penalty_for_hole, np.where(is_goal, reward_for_goal, standard_reward)).astype(float)
+        rewards = dict(zip(states, reward_array.tolist()))
 
         # now construct the MDP
         self.states_ = states
         self.actions_ = actions
-        self.transition_probas = transition_probas
         self.rewards = rewards
+        self.reward_array = reward_array
+        self.terminal = is_hole | is_goal
+        self._transition_probas = None
+        self._transition_operator = None
+
+    def compile(self, reachable=False):
+        """
+
+        :param reachable: if True, the compiled form is restricted to the cells reachable from `init_states`
+        :return: `CompiledMDP` whose transition matrix is assembled with array shifts over the whole grid
+        """
+        m, n = self.world.shape
+        n_actions = len(self.actions_)
+
+        # index of the state reached by each move from every cell, clamped at the walls
+        rows, cols = np.divmod(np.arange(m * n), n)
+        moves = {
+            "u": np.maximum(rows - 1, 0) * n + cols,
+            "r": rows * n + np.minimum(cols + 1, n - 1),
+            "d": np.minimum(rows + 1, m - 1) * n + cols,
+            "l": rows * n + np.maximum(cols - 1, 0),
+        }
+
+        non_terminal = np.flatnonzero(~self.terminal)
+        p_success, p_slip = self.move_probabilities
+        entry_rows, entry_cols, entry_probas = [], [], []
+        for j, a in enumerate(self.actions_):
+            for move, p in [(a, p_success), (self.slips[a][0], p_slip), (self.slips[a][1], p_slip)]:
+                entry_rows.append(non_terminal * n_actions + j)
+                entry_cols.append(moves[move][non_terminal])
+                entry_probas.append(np.full(len(non_terminal), p))
+        transitions = sp.csr_matrix(
+            (np.concatenate(entry_probas), (np.concatenate(entry_rows), np.concatenate(entry_cols))),
+            shape=(m * n * n_actions, m * n)
+        )
+        transitions.sum_duplicates()
+
+        available = np.zeros((m * n, n_actions), dtype=bool)
+        available[non_terminal] = True
+        compiled = CompiledMDP(self.states_, self.actions_, transitions, self.reward_array, available, self.terminal)
+        if reachable:
+            init_indices = [r * n + c for r, c in self.init_states]
+            compiled = compiled.restrict(compiled.get_reachable_states(init_indices))
+        return compiled
+
+    @property
+    def transition_operator(self):
+        """
+
+        :return: `LakeTransitionOperator` that applies the slip stencil to value grids without materializing P
+        """
+        if self._transition_operator is None:
+            self._transition_operator = LakeTransitionOperator(self)
+        return self._transition_operator
+
+    @property
+    def transition_probas(self):
+        """
+
+        :return: dictionary with transition_probas[s][a][s'] = P(s'|s,a); it is only materialized on first access
+        """
+        if self._transition_probas is None:
+            _, self._transition_probas, _ = get_compiled_form_of_mdp(self).to_closed_form()
+        return self._transition_probas
 
     @property
     def init_states(self) -> list:
@@ -172,7 +176,7 @@ class LakeMDP(MDP):
         if self.world[r, c]:
             return True
         m, n = self.world.shape
-        return r == n - 1 and c == m - 1
+        return r == m - 1 and c == n - 1
 
     def print_policy(self, policy):
         hline = "+" + "-+" * (self.world.shape[0])
@@ -187,3 +191,77 @@ class LakeMDP(MDP):
                 out += "|"
             out += "\n" + hline
         print(out)
+
+
+class LakeTransitionOperator(CompiledMDP):
+    """
+        Matrix-free compiled form of a `LakeMDP`.
+
+        P_a v is computed for all actions at once by shifting the value grid one cell in each direction (clamped at
+        the walls) and mixing the shifted grids with the slip probabilities, so the transition matrix never exists.
+    """
+
+    def __init__(self, lake):
+        """
+        :param lake: the `LakeMDP` whose dynamics are represented
+        """
+        n_states, n_actions = len(lake.states), len(lake.actions)
+        available = np.zeros((n_states, n_actions), dtype=bool)
+        available[~lake.terminal] = True
+        super().__init__(lake.states, lake.actions, None, lake.reward_array, available, lake.terminal)
+        self.shape = lake.world.shape
+        self.slips = lake.slips
+        self.move_probabilities = lake.move_probabilities
+
+    @staticmethod
+    def _shift(grid, move):
+        """
+        :param grid: array of shape (m, n) with one value per cell
+        :param move: one of "u", "r", "d", "l"
+        :return: array whose entry (r, c) is the value of the cell reached from (r, c) by `move`
+        """
+        if move == "u":
+            return np.concatenate([grid[:1], grid[:-1]], axis=0)
+        if move == "d":
+            return np.concatenate([grid[1:], grid[-1:]], axis=0)
+        if move == "l":
+            return np.concatenate([grid[:, :1], grid[:, :-1]], axis=1)
+        return np.concatenate([grid[:, 1:], grid[:, -1:]], axis=1)
+
+    def apply(self, v):
+        grid = np.asarray(v, dtype=float).reshape(self.shape)
+        shifted = {move: self._shift(grid, move).ravel() for move in self.slips}
+        p_success, p_slip = self.move_probabilities
+        result = np.empty((self.n_states, self.n_actions))
+        for j, a in enumerate(self.actions):
+            first, second = self.slips[a]
+            result[:, j] = p_success * shifted[a] + p_slip * (shifted[first] + shifted[second])
+        result[self.terminal] = 0
+        return result
+
+    def get_policy_matrix(self, action_indices):
+        """
+        :param action_indices: integer array of length S as returned by `get_action_indices`
+        :return: S x S `LinearOperator` that applies P_pi without materializing it
+        """
+        action_indices = np.array(action_indices)
+        return spla.LinearOperator(
+            (self.n_states, self.n_states), matvec=lambda v: self.apply_policy(action_indices, np.ravel(v)), dtype=float
+        )
+
+    def get_block_policy_matrix(self, action_indices):
+        """
+        :param action_indices: integer array of shape (K, S) with the action indices of K policies
+        :return: (K S) x (K S) block-diagonal `LinearOperator` that applies P_pi of each policy to its block
+        """
+        action_indices = np.array(action_indices)
+        size = action_indices.size
+
+        def matvec(v):
+            v = np.ravel(v).reshape(action_indices.shape)
+            return np.concatenate([self.apply_policy(a, block) for a, block in zip(action_indices, v)])
+
+        return spla.LinearOperator((size, size), matvec=matvec, dtype=float)
+
+    def to_closed_form(self):
+        raise NotImplementedError("The matrix-free operator has no closed form; use `LakeMDP.compile` instead.")
@@ -1,4 +1,10 @@
 from ._base import MDP
-from ._mdp_utils import get_closed_form_of_mdp, get_random_policy
+from ._compiled import CompiledMDP
+from ._policy import Policy
+from ._sampler import TransitionSampler
+from ._mdp_utils import get_closed_form_of_mdp, get_compiled_form_of_mdp, get_random_policy, get_random_policies
 
-__all__ = ["MDP", "get_closed_form_of_mdp", "get_random_policy"]
\ No newline at end of file
+__all__ = [
+    "MDP", "CompiledMDP", "Policy", "TransitionSampler", "get_closed_form_of_mdp", "get_compiled_form_of_mdp",
+    "get_random_policy", "get_random_policies"
+]
\ No newline at end of file
@@ -1,6 +1,7 @@
 import numpy as np
 
 from abc import ABC
+from ._compiled import CompiledMDP
 
 
 class MDP(ABC):
@@ -38,9 +39,9 @@ class MDP(ABC):
 
         :return: list of all actions the agent could ever execute in any state.
         """
-        actions = set()
-        for s in self.get_states():
-            actions |= set(self.get_actions_in_state(s))
+        actions = {}  # dict to keep the order of first appearance
+        for s in self.states:
+            actions.update(dict.fromkeys(self.get_actions_in_state(s)))
         return list(actions)
 
     def get_actions_in_state(self, s) -> list:
@@ -68,9 +69,21 @@ class MDP(ABC):
         """
         raise NotImplementedError
 
+    def compile(self, reachable=False):
+        """
 
+        :param reachable: if True, only the states reachable from `init_states` are compiled (found by exploring
+            forward from them, so `states` does not need to be enumerable)
+        :return: `CompiledMDP` with the array-backed form of this MDP (built through the dictionary interface unless overridden)
+        """
+        if reachable:
+            return CompiledMDP.from_reachable(self)
+        return CompiledMDP.from_mdp(self)
 
+    @property
+    def transition_operator(self):
+        """
 
-
-
-
+        :return: matrix-free `CompiledMDP` whose `apply` computes P_a v without materializing P (might not be implemented)
+        """
+        raise NotImplementedError
@@ -0,0 +1,279 @@
+from collections import deque
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import breadth_first_order
+
+from ._policy import Policy
+from ._sampler import TransitionSampler
+
+
+class CompiledMDP:
+    """
+        Array-backed form of a finite MDP.
+
+        States and actions are given stable integer indices. Row `i * n_actions + j` of `transitions` holds
+        P(.|s_i, a_j); rows of actions that are not applicable in a state (including all rows of terminal states)
+        are empty.
+    """
+
+    def __init__(self, states, actions, transitions, rewards, available, terminal=None):
+        """
+        :param states: list of states, the position of a state in this list is its index
+        :param actions: list of actions, the position of an action in this list is its index
+        :param transitions: sparse matrix of shape (S * A, S) with transitions[i * A + j, k] = P(s_k|s_i, a_j)
+            (None for matrix-free subclasses that override `apply` and `get_policy_matrix`)
+        :param rewards: array of length S with the reward of each state
+        :param available: boolean array of shape (S, A) that is True iff action j is applicable in state i
+        :param terminal: boolean array of length S that is True for terminal states (derived from `available` if not given)
+        """
+        self.states = states if isinstance(states, list) else list(states)
+        self.actions = list(actions)
+        self._state_index = None
+        self._sampler = None
+        self.action_index = {a: j for j, a in enumerate(self.actions)}
+        self.transitions = None if transitions is None else sp.csr_matrix(transitions)
+        self.rewards = np.asarray(rewards, dtype=float)
+        self.available = np.asarray(available, dtype=bool)
+        if terminal is None:
+            terminal = ~self.available.any(axis=1)
+        self.terminal = np.asarray(terminal, dtype=bool)
+
+        n, k = self.n_states, self.n_actions
+        if self.transitions is not None and self.transitions.shape != (n * k, n):
+            raise ValueError(f"Transition matrix has shape {self.transitions.shape} but ({n * k}, {n}) was expected.")
+        if self.rewards.shape != (n,) or self.available.shape != (n, k) or self.terminal.shape != (n,):
+            raise ValueError("Rewards, availability and terminal mask do not match the number of states and actions.")
+
+    @classmethod
+    def from_mdp(cls, mdp, states=None):
+        """
+        :param mdp: the MDP object
+        :param states: the states to compile (all states of the MDP if not given)
+        :return: the compiled form of `mdp`, built through its dictionary interface
+        """
+        states = list(mdp.states if states is None else states)
+        distributions = [
+            {} if mdp.is_terminal_state(s) else {a: mdp.get_transition_distribution(s, a) for a in mdp.get_actions_in_state(s)}
+            for s in states
+        ]
+        return cls._from_distributions(mdp, states, distributions)
+
+    @classmethod
+    def from_reachable(cls, mdp, init_states=None):
+        """
+        :param mdp: the MDP object (its `states` are never enumerated)
+        :param init_states: states from which the exploration starts (`mdp.init_states` if not given)
+        :return: the compiled form of the states reachable from `init_states`, found by a breadth-first exploration
+            through `get_actions_in_state` and `get_transition_distribution` (states are indexed in discovery order)
+        """
+        states = []
+        state_index = {}
+        for s in mdp.init_states if init_states is None else init_states:
+            if s not in state_index:
+                state_index[s] = len(states)
+                states.append(s)
+
+        distributions = []
+        frontier = deque(states)
+        while frontier:
+            s = frontier.popleft()
+            distributions_of_s = {}
+            if not mdp.is_terminal_state(s):
+                for a in mdp.get_actions_in_state(s):
+                    distribution = {
+                        s_prime: p for s_prime, p in mdp.get_transition_distribution(s, a).items() if p > 0
+                    }
+                    distributions_of_s[a] = distribution
+                    for s_prime in distribution:
+                        if s_prime not in state_index:
+                            state_index[s_prime] = len(states)
+                            states.append(s_prime)
+                            frontier.append(s_prime)
+            distributions.append(distributions_of_s)
+        return cls._from_distributions(mdp, states, distributions)
+
+    @classmethod
+    def _from_distributions(cls, mdp, states, distributions):
+        """
+        :param mdp: the MDP object (used for the rewards)
+        :param states: list of states
+        :param distributions: list with a dictionary a -> {s': P(s'|s, a)} for every state (empty for terminal states)
+        :return: the compiled form over `states`
+        """
+        state_index = {s: i for i, s in enumerate(states)}
+
+        # collect actions in order of first appearance (the base `MDP.actions` may enumerate all states)
+        actions = []
+        action_index = {}
+        for distributions_of_s in distributions:
+            for a in distributions_of_s:
+                if a not in action_index:
+                    action_index[a] = len(actions)
+                    actions.append(a)
+
+        n, k = len(states), len(actions)
+        available = np.zeros((n, k), dtype=bool)
+        rows, cols, data = [], [], []
+        for i, distributions_of_s in enumerate(distributions):
+            for a, distribution in distributions_of_s.items():
+                j = action_index[a]
+                available[i, j] = True
+                for s_prime, p in distribution.items():
+                    rows.append(i * k + j)
+                    cols.append(state_index[s_prime])
+                    data.append(p)
+
+        transitions = sp.csr_matrix((data, (rows, cols)), shape=(n * k, n))
+        transitions.sum_duplicates()
+        rewards = np.array([mdp.get_reward(s) for s in states], dtype=float)
+        terminal = np.array([not distributions_of_s for distributions_of_s in distributions], dtype=bool)
+        return cls(states, actions, transitions, rewards, available, terminal)
+
+    def get_reachable_states(self, init_indices):
+        """
+        :param init_indices: indices of the states from which the exploration starts
+        :return: sorted array with the indices of all states reachable from `init_indices` under some policy
+        """
+        # grafo de estados: arista s -> s' si alguna acción lleva de s a s' con probabilidad positiva
+        coo = self.transitions.tocoo()
+        positive = coo.data > 0  # los ceros almacenados explícitamente no son aristas
+        graph = sp.csr_matrix(
+            (np.ones(np.count_nonzero(positive)), (coo.row[positive] // self.n_actions, coo.col[positive])),
+            shape=(self.n_states, self.n_states)
+        )
+        reached = np.zeros(self.n_states, dtype=bool)
+        for i in init_indices:
+            if not reached[i]:
+                reached[breadth_first_order(graph, i, directed=True, return_predecessors=False)] = True
+        return np.flatnonzero(reached)
+
+    def restrict(self, state_indices):
+        """
+        :param state_indices: sorted indices of a set of states that is closed under the transitions (e.g. the
+            result of `get_reachable_states`)
+        :return: the `CompiledMDP` over these states only
+        """
+        state_indices = np.asarray(state_indices)
+        rows = (state_indices[:, None] * self.n_actions + np.arange(self.n_actions)).ravel()
+        transitions = self.transitions[rows][:, state_indices]
+        return CompiledMDP(
+            [self.states[i] for i in state_indices], self.actions, transitions, self.rewards[state_indices],
+            self.available[state_indices], self.terminal[state_indices]
+        )
+
+    @property
+    def state_index(self):
+        """
+        :return: dictionary that maps each state to its index (built on first access)
+        """
+        if self._state_index is None:
+            self._state_index = dict(zip(self.states, range(len(self.states))))
+        return self._state_index
+
+    @property
+    def sampler(self):
+        """
+        :return: `TransitionSampler` with alias tables over the transition rows (built on first access)
+        """
+        if self._sampler is None:
+            self._sampler = TransitionSampler(self)
+        return self._sampler
+
+    def sample(self, states, actions, rng=None):
+        """
+        :param states: integer array with state indices
+        :param actions: integer array with the index of an action applicable in each of these states
+        :param rng: numpy random generator
+        :return: integer array with one successor state index sampled for every (state, action) pair
+        """
+        return self.sampler.sample(states, actions, rng)
+
+    @property
+    def n_states(self):
+        return len(self.states)
+
+    @property
+    def n_actions(self):
+        return len(self.actions)
+
+    def get_action_indices(self, policy):
+        """
+        :param policy: function that maps a state to an action (or a `Policy` over the same states and actions)
+        :return: integer array of length S with the index of the action chosen in each state (-1 in terminal states)
+        """
+        if isinstance(policy, Policy) and policy.compiled.states is self.states and policy.compiled.actions == self.actions:
+            return policy.action_indices
+        action_indices = np.full(self.n_states, -1, dtype=np.int64)
+        for i in np.flatnonzero(~self.terminal):
+            a = policy(self.states[i])
+            if a is not None:
+                action_indices[i] = self.action_index[a]
+        return action_indices
+
+    def apply(self, v):
+        """
+        :param v: array of length S with one value per state
+        :return: S x A array with sum_s' P(s'|s_i, a_j) v(s') in entry (i, j); zero where a_j is not applicable in s_i
+        """
+        return (self.transitions @ v).reshape(self.n_states, self.n_actions)
+
+    def apply_policy(self, action_indices, v):
+        """
+        :param action_indices: integer array of length S as returned by `get_action_indices`
+        :param v: array of length S with one value per state
+        :return: array with sum_s' P(s'|s_i, pi(s_i)) v(s') in entry i; zero in states without an action
+        """
+        action_indices = np.asarray(action_indices)
+        expected = self.apply(v)[np.arange(self.n_states), np.maximum(action_indices, 0)]
+        expected[action_indices < 0] = 0
+        return expected
+
+    def get_policy_matrix(self, action_indices):
+        """
+        :param action_indices: integer array of length S as returned by `get_action_indices`
+        :return: sparse S x S matrix P_pi with P_pi[i, k] = P(s_k|s_i, pi(s_i)); rows without an action are empty
+        """
+        return self.get_block_policy_matrix(np.asarray(action_indices)[None])
+
+    def get_block_policy_matrix(self, action_indices):
+        """
+        :param action_indices: integer array of shape (K, S) with the action indices of K policies
+        :return: sparse block-diagonal (K S) x (K S) matrix whose k-th diagonal block is P_pi of the k-th policy
+        """
+        action_indices = np.asarray(action_indices)
+        n_policies = len(action_indices)
+        has_action = (action_indices >= 0).ravel()
+        rows = (np.arange(self.n_states) * self.n_actions + np.where(action_indices >= 0, action_indices, 0)).ravel()
+
+        # pick the rows of the chosen actions directly from the CSR buffers
+        indptr = self.transitions.indptr
+        starts, ends = indptr[rows], indptr[rows + 1]
+        lengths = np.where(has_action, ends - starts, 0)
+        new_indptr = np.zeros(len(rows) + 1, dtype=indptr.dtype)
+        np.cumsum(lengths, out=new_indptr[1:])
+        offsets = np.arange(new_indptr[-1]) - np.repeat(new_indptr[:-1], lengths)
+        positions = np.repeat(starts, lengths) + offsets
+        # the columns of block k are shifted by k * S
+        column_offsets = np.repeat(np.arange(len(rows)) // self.n_states * self.n_states, lengths)
+        size = n_policies * self.n_states
+        return sp.csr_matrix(
+            (self.transitions.data[positions], self.transitions.indices[positions] + column_offsets, new_indptr),
+            shape=(size, size)
+        )
+
+    def to_closed_form(self):
+        """
+        :return: triple (states, probs, rewards) in the format of `get_closed_form_of_mdp`
+        """
+        probs = {}
+        transitions = self.transitions
+        for i in np.flatnonzero(self.available.any(axis=1)):
+            probs[self.states[i]] = {}
+            for j in np.flatnonzero(self.available[i]):
+                row = i * self.n_actions + j
+                lo, hi = transitions.indptr[row], transitions.indptr[row + 1]
+                probs[self.states[i]][self.actions[j]] = {
+                    self.states[k]: p for k, p in zip(transitions.indices[lo:hi].tolist(), transitions.data[lo:hi].tolist())
+                }
+        return list(self.states), probs, self.rewards.copy()
@@ -1,29 +1,40 @@
 import numpy as np
 
-def get_random_policy(mdp, seed=None, deterministic=True):
+from ._policy import Policy
+
+
+def get_random_policy(mdp, seed=None, deterministic=True, matrix_free=False):
     """
         :param mdp: the MDP object
         :param seed: the seed to control the randomness of the policy
+        :param deterministic: if True, the policy is a `Policy` that fixes one random action per state; otherwise a
+            function that draws a new random action on every call
+        :param matrix_free: if True, the `Policy` is indexed by `mdp.transition_operator`, so P is never materialized
         :return: a random policy for the MDP
     """
-    rs = np.random.RandomState(seed)
+    if deterministic:
+        return Policy.random(get_compiled_form_of_mdp(mdp, matrix_free=matrix_free), seed)
 
-    choices = {}
+    rs = np.random.RandomState(seed)
 
     def choose(s):
-        if s not in choices:
-            actions = mdp.get_actions_in_state(s)
-            if not actions:
-                raise ValueError(f"No action can be picked in a terminal state.")
-            action = actions[rs.choice(range(len(actions)))]
-            if deterministic:
-                choices[s] = action
-            else:
-                return action
-        return choices[s]
+        actions = mdp.get_actions_in_state(s)
+        if not actions:
+            raise ValueError(f"No action can be picked in a terminal state.")
+        return actions[rs.choice(range(len(actions)))]
 
     return choose
 
+def get_random_policies(mdp, n, seed=None, matrix_free=False):
+    """
+        :param mdp: the MDP object
+        :param n: number of policies to generate
+        :param seed: the seed to control the randomness of the policies
+        :param matrix_free: if True, the policies are indexed by `mdp.transition_operator` (see `get_random_policy`)
+        :return: list of `n` random deterministic `Policy` objects for the MDP
+    """
+    return Policy.random_batch(get_compiled_form_of_mdp(mdp, matrix_free=matrix_free), n, seed)
+
 def get_policy_from_dict(action_map):
     """
         :param action_map: keys are states, values are actions
@@ -32,12 +43,15 @@ def get_policy_from_dict(action_map):
     return lambda s: action_map[s]
 
 
-def get_closed_form_of_mdp(mdp):
+def get_closed_form_of_mdp(mdp, reachable=False):
 
     """
     :param mdp: the MDP object
+    :param reachable: if True, only the states reachable from `mdp.init_states` are included
     :return: triple (states, probs, rewards), where `states` and `rewards` are lists, and probs[s][a][s'] = P(s'|s,a)
     """
+    if reachable:
+        return get_compiled_form_of_mdp(mdp, reachable=True).to_closed_form()
     states = list(mdp.states)
     probs = {}
     for s in states:
@@ -47,4 +61,24 @@ def get_closed_form_of_mdp(mdp):
         if p_s:
             probs[s] = p_s
     rewards = np.array([mdp.get_reward(s) for s in states])
-    return states, probs, rewards
\ No newline at end of file
+    return states, probs, rewards
+
+
+def get_compiled_form_of_mdp(mdp, reachable=False, matrix_free=False):
+    """
+    :param mdp: the MDP object
+    :param reachable: if True, the compiled form only covers the states reachable from `mdp.init_states`
+    :param matrix_free: if True, `mdp.transition_operator` is returned instead; it has the same state and action
+        indices, `available` and `terminal` arrays as the full compiled form, but never materializes P
+    :return: the `CompiledMDP` of `mdp`; it is built on the first call and cached on the MDP object afterwards
+    """
+    if matrix_free:
+        if reachable:
+            raise ValueError("The matrix-free operator covers all states and cannot be restricted to reachable states.")
+        return mdp.transition_operator
+    attribute = "_reachable_compiled_form" if reachable else "_compiled_form"
+    compiled = getattr(mdp, attribute, None)
+    if compiled is None:
+        compiled = mdp.compile(reachable=True) if reachable else mdp.compile()
+        setattr(mdp, attribute, compiled)
+    return compiled
@@ -0,0 +1,94 @@
+import hashlib
+import numpy as np
+
+
+class Policy:
+    """
+        Deterministic policy backed by an integer action array over the state index of a `CompiledMDP`.
+
+        Entry i of `action_indices` is the index of the action chosen in state i, or -1 if no action is chosen there
+        (terminal states). The policy can still be called as `policy(s)`.
+    """
+
+    def __init__(self, compiled, action_indices):
+        """
+        :param compiled: the `CompiledMDP` whose state and action indices are used
+        :param action_indices: integer array of length S with the chosen action index per state (-1 for none)
+        """
+        action_indices = np.array(action_indices, dtype=np.int64)
+        if action_indices.shape != (compiled.n_states,):
+            raise ValueError(f"Expected {compiled.n_states} action indices but got an array of shape {action_indices.shape}.")
+        action_indices.setflags(write=False)
+        self.compiled = compiled
+        self.action_indices = action_indices
+        self._fingerprint = None
+
+    @classmethod
+    def from_callable(cls, compiled, policy):
+        """
+        :param compiled: the `CompiledMDP` whose state and action indices are used
+        :param policy: function that maps a state to an action
+        :return: the `Policy` that chooses the same actions as `policy`
+        """
+        return cls(compiled, compiled.get_action_indices(policy))
+
+    @classmethod
+    def random(cls, compiled, seed=None):
+        """
+        :param compiled: the `CompiledMDP` whose state and action indices are used
+        :param seed: the seed to control the randomness of the policy
+        :return: a policy that picks a uniformly random applicable action in every non-terminal state
+        """
+        return cls.random_batch(compiled, 1, seed)[0]
+
+    @classmethod
+    def random_batch(cls, compiled, n, seed=None):
+        """
+        :param compiled: the `CompiledMDP` whose state and action indices are used
+        :param n: number of policies to generate
+        :param seed: the seed to control the randomness of the policies
+        :return: list of `n` random policies, each drawn as in `random`
+        """
+        rs = np.random.RandomState(seed)
+        policies = []
+        for _ in range(n):
+            # the applicable action with the largest random key is uniformly distributed among the applicable ones
+            keys = rs.random_sample(compiled.available.shape)
+            keys[~compiled.available] = -1
+            action_indices = keys.argmax(axis=1)
+            action_indices[~compiled.available.any(axis=1)] = -1
+            policies.append(cls(compiled, action_indices))
+        return policies
+
+    def __call__(self, s):
+        i = self.compiled.state_index.get(s)  # None for states outside the compiled form (e.g. unreachable ones)
+        j = -1 if i is None else self.action_indices[i]
+        return None if j < 0 else self.compiled.actions[j]
+
+    def apply(self, state_indices):
+        """
+        :param state_indices: integer array of state indices
+        :return: integer array with the index of the action chosen in each of these states (-1 for none)
+        """
+        return self.action_indices[state_indices]
+
+    @property
+    def fingerprint(self):
+        """
+        :return: hex digest of the action array; equal policies over the same MDP have equal fingerprints
+        """
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.blake2b(self.action_indices.tobytes(), digest_size=16).hexdigest()
+        return self._fingerprint
+
+    def __hash__(self):
+        return hash(self.fingerprint)
+
+    def __eq__(self, other):
+        if not isinstance(other, Policy):
+            return NotImplemented
+        return (
+            self.compiled.states is other.compiled.states
+            and self.fingerprint == other.fingerprint
+            and np.array_equal(self.action_indices, other.action_indices)
+        )
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class TransitionSampler:
+    """
+        Alias tables over the rows of the transition matrix of a `CompiledMDP`.
+
+        Every stored entry of a row (s, a) is one bin of the row's alias table: bin b keeps its own successor with
+        probability `prob[b]` and hands over to the successor `alias[b]` otherwise. Drawing a successor then costs one
+        uniform number and one comparison, whatever the number of successors of the row.
+    """
+
+    def __init__(self, compiled):
+        """
+        :param compiled: the `CompiledMDP` whose transitions are sampled (it must hold a transition matrix)
+        """
+        if compiled.transitions is None:
+            raise ValueError("Sampling needs the transition matrix of the compiled MDP.")
+        transitions = compiled.transitions
+        self.n_actions = compiled.n_actions
+        self.indptr = transitions.indptr
+        self.indices = transitions.indices
+        self.prob = np.ones(transitions.nnz)
+        self.alias = transitions.indices.copy()
+
+        # rows with the same number of successors are built together; at each step, the smallest remaining bin of
+        # every row is filled up by its largest remaining bin (which is then at least 1 on the scaled scale)
+        lengths = np.diff(self.indptr)
+        for k in np.unique(lengths[lengths > 1]):
+            rows = np.flatnonzero(lengths == k)
+            positions = self.indptr[rows][:, None] + np.arange(k)
+            scaled = transitions.data[positions] * k / transitions.data[positions].sum(axis=1, keepdims=True)
+            prob = np.ones((len(rows), k))
+            alias = transitions.indices[positions]
+            done = np.zeros((len(rows), k), dtype=bool)
+            row_range = np.arange(len(rows))
+            for _ in range(k - 1):
+                small = np.where(done, np.inf, scaled).argmin(axis=1)
+                large = np.where(done, -np.inf, scaled).argmax(axis=1)
+                prob[row_range, small] = scaled[row_range, small]
+                alias[row_range, small] = transitions.indices[positions[row_range, large]]
+                scaled[row_range, large] -= 1 - scaled[row_range, small]
+                done[row_range, small] = True
+            self.prob[positions] = np.clip(prob, 0, 1)
+            self.alias[positions] = alias
+
+    def sample(self, states, actions, rng=None):
+        """
+        :param states: integer array with state indices
+        :param actions: integer array with the index of an action applicable in each of these states
+        :param rng: numpy random generator (a new default generator if not given)
+        :return: integer array with one successor state index sampled from P(.|s, a) for every pair
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        rows = np.asarray(states) * self.n_actions + np.asarray(actions)
+        start = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - start
+        if np.any(lengths == 0):
+            raise ValueError("Cannot sample from a state-action pair without successors.")
+        u = rng.random(len(rows)) * lengths
+        bins = u.astype(np.int64)
+        positions = start + np.minimum(bins, lengths - 1)
+        return np.where(u - bins < self.prob[positions], self.indices[positions], self.alias[positions])
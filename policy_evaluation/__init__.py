@@ -1,3 +1,8 @@
 from ._base import PolicyEvaluator
+from ._linear import LinearSystemEvaluator
+from ._iterative import IterativePolicyEvaluator
+from ._monte_carlo import MonteCarloPolicyEvaluator
+from ._scc import SCCPolicyEvaluator
 
-__all__ = ["PolicyEvaluator"]
\ No newline at end of file
+__all__ = ["PolicyEvaluator", "LinearSystemEvaluator", "IterativePolicyEvaluator", "MonteCarloPolicyEvaluator",
+           "SCCPolicyEvaluator"]
\ No newline at end of file
@@ -1,20 +1,73 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+import numpy as np
 
 
 class PolicyEvaluator(ABC):
 
-    def __init__(self, gamma):
+    def __init__(self, gamma, cache_size=4):
+        """
+            :param gamma: discount factor
+            :param cache_size: number of evaluations kept in an LRU cache keyed by (policy fingerprint, gamma), so that
+                resetting with a recently evaluated policy skips the solve (0 disables the cache)
+        """
         self.gamma = gamma
         self.policy = None
         self._v_values = None
         self._q_values = None
+        self.cache_size = cache_size
+        self.cache_hit = False  # True if the last reset was served from the cache
+        self._cache = OrderedDict()
+        self._cache_entry = None
+        self._advantage_array = None
 
     def reset(self, policy):
         """
             :param policy: the policy that is subject to evaluation
         """
         self.policy = policy
+        self._advantage_array = None
+        key = self._cache_key(policy) if self.cache_size else None
+        entry = None if key is None else self._cache.get(key)
+        self.cache_hit = entry is not None
+        if entry is not None:
+            self._cache.move_to_end(key)
+            self._cache_entry = entry
+            self._restore(entry)
+            return
+
+        self._cache_entry = None
         self._after_reset()
+        if key is not None and self._is_cacheable():
+            self._cache_entry = self._cache[key] = self._snapshot()
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_key(self, policy):
+        """
+            :param policy: the policy with which the evaluator is being reset
+            :return: hashable key identifying the evaluation of `policy` (None if this evaluator does not cache)
+        """
+        return None
+
+    def _is_cacheable(self):
+        """
+            :return: True if the evaluation that has just been computed may be stored in the cache
+        """
+        return True
+
+    def _snapshot(self):
+        """
+            :return: dictionary with the results of the current evaluation, to be stored in the cache
+        """
+        raise NotImplementedError
+
+    def _restore(self, entry):
+        """
+            :param entry: dictionary returned by `_snapshot` for an earlier evaluation of the same policy
+        """
+        raise NotImplementedError
     
     def _after_reset(self):
         """
@@ -46,3 +99,70 @@ class PolicyEvaluator(ABC):
             :return: a 2-depth dictionary q where q[s][a] estimates q^\pi(s,a) for the current policy \pi
         """
         raise NotImplementedError
+
+    def evaluate_batch(self, policies):
+        """
+            :param policies: list of policies
+            :return: array of shape (len(policies), S) whose k-th row holds the state values of `policies[k]` over the
+                compiled state index (if supported)
+
+            The default implementation resets the evaluator with each policy in turn, so afterwards it is left reset
+            with the last one.
+        """
+        values = []
+        for policy in policies:
+            self.reset(policy)
+            values.append(np.array(self.v_array))
+        return np.array(values)
+
+    @property
+    def diagnostics(self):
+        """
+            :return: dictionary with diagnostics of the last evaluation (e.g. residual or number of sweeps)
+        """
+        return {}
+
+    @property
+    def v_array(self):
+        """
+            :return: array with the state values of the current policy over the compiled state index (if supported)
+        """
+        raise NotImplementedError
+
+    @property
+    def q_array(self):
+        """
+            :return: S x A array with the q-values of the current policy over the compiled state and action indices (if supported)
+        """
+        raise NotImplementedError
+
+    @property
+    def advantage_array(self):
+        """
+            :return: S x A array with the advantages A(s, a) = q(s, a) - v(s) of the current policy; NaN where `a` is
+                not applicable in `s` (so all entries of terminal states are NaN). Derived from `q_array` and `v_array`
+                once per evaluation.
+        """
+        if self._advantage_array is None:
+            self._advantage_array = self.q_array - np.asarray(self.v_array)[:, None]
+        return self._advantage_array
+
+    def get_max_advantages(self):
+        """
+            :return: array of length S with max_a A(s, a) for every state; -inf in states without applicable actions
+        """
+        advantages = self.advantage_array
+        return np.where(np.isnan(advantages), -np.inf, advantages).max(axis=1, initial=-np.inf)
+
+    def get_most_improvable_states(self, k):
+        """
+            :param k: number of states to return
+            :return: pair (state indices, max advantages) of the (at most) `k` states with the largest max advantage,
+                sorted by decreasing advantage; states without applicable actions are never returned
+        """
+        max_advantages = self.get_max_advantages()
+        candidates = np.flatnonzero(np.isfinite(max_advantages))
+        if k < len(candidates):
+            candidates = candidates[np.argpartition(-max_advantages[candidates], k - 1)[:k]]
+        order = np.argsort(-max_advantages[candidates], kind="stable")
+        return candidates[order], max_advantages[candidates[order]]
@@ -0,0 +1,138 @@
+from ._linear import LinearSystemEvaluator
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from mdp import get_compiled_form_of_mdp
+
+
+class IterativePolicyEvaluator(LinearSystemEvaluator):
+
+    METHODS = ("jacobi", "gauss-seidel", "sor", "gmres")
+
+    def __init__(self, mdp, gamma, method="gauss-seidel", tol=1e-8, max_iter=10**4, omega=1.1, warm_start=False,
+                 relative_tol=0, matrix_free=False, cache_size=4, reachable=False):
+        """
+            :param mdp: the MDP whose policies are evaluated
+            :param gamma: discount factor
+            :param method: one of "jacobi", "gauss-seidel", "sor" (successive over-relaxation) or "gmres"
+            :param tol: the iteration stops once the residual max_s |((I - gamma * P_pi) v - r)(s)| is below `tol`
+            :param max_iter: maximum number of sweeps (or Krylov iterations for "gmres")
+            :param omega: relaxation factor used by "sor"
+            :param warm_start: if True, each evaluation starts from the state values of the previous one instead of zeros
+            :param relative_tol: if positive, the iteration also stops once the residual has been reduced by this factor
+            :param matrix_free: if True, P_pi is only applied through `mdp.transition_operator` and never materialized;
+                this supports "jacobi" (as plain backups v <- r + gamma * P_pi v) and "gmres"
+            :param cache_size: number of evaluations kept in the LRU cache of the evaluator (0 disables it); only
+                evaluations that reached `tol` are cached, so partial evaluations are always continued
+            :param reachable: if True, only the states reachable from `mdp.init_states` are evaluated (not matrix-free)
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown method {method}, must be one of {self.METHODS}.")
+        if matrix_free and method not in ("jacobi", "gmres"):
+            raise ValueError(f"Method {method} needs the transition matrix and cannot run matrix-free.")
+        if matrix_free and reachable:
+            raise ValueError("The matrix-free operator covers the whole grid and cannot be restricted to reachable states.")
+        self.matrix_free = matrix_free
+        super().__init__(mdp, gamma, sparse=True, tol=tol, cache_size=cache_size, reachable=reachable)
+        self.method = method
+        self.max_iter = max_iter
+        self.omega = omega
+        self.warm_start = warm_start
+        self.relative_tol = relative_tol
+        self.residual = None
+        self.sweeps = 0
+
+    @property
+    def diagnostics(self):
+        return {
+            "cache_hit": self.cache_hit, "method": self.method,
+            "residual": None if self.residual is None else float(self.residual), "sweeps": self.sweeps
+        }
+
+    def _is_cacheable(self):
+        return self.residual is not None and self.residual <= self.tol
+
+    def _snapshot(self):
+        entry = super()._snapshot()
+        entry["residual"] = self.residual
+        return entry
+
+    def _restore(self, entry):
+        super()._restore(entry)
+        self.residual = entry["residual"]
+        self.sweeps = 0
+
+    def _compile(self, mdp):
+        return get_compiled_form_of_mdp(mdp, self.reachable, self.matrix_free)
+
+    def _solve(self, P_pi, y, gamma):
+        """
+            :param P_pi: sparse S x S transition matrix of the current policy
+            :param y: rewards of the states
+            :param gamma: discount factor used in the system
+            :return: approximate solution v of (I - gamma * P_pi) v = y
+
+            iterates until the residual drops below `tol` (or `relative_tol` times the initial residual) or `max_iter` is reached
+        """
+        n = len(y)
+        if self.matrix_free:
+            A = spla.aslinearoperator(sp.identity(n)) - gamma * P_pi
+        else:
+            A = (sp.identity(n, format="csr") - gamma * P_pi).tocsr()
+        v = self._initial_values(n)
+        residual = y - A @ v
+        self.residual = np.max(np.abs(residual), initial=0)
+        target = max(self.tol, self.relative_tol * self.residual)
+
+        if self.method == "gmres":
+            sweeps = [0]
+
+            def count(_):
+                sweeps[0] += 1
+
+            # scipy counts restart cycles in `maxiter`, so the cap on inner iterations is split accordingly
+            restart = max(1, min(n, 20, self.max_iter))
+            v, _ = spla.gmres(
+                A, y, x0=v, rtol=0, atol=target, maxiter=-(-self.max_iter // restart), restart=restart,
+                callback=count, callback_type="pr_norm"
+            )
+            self.sweeps = sweeps[0]
+            self.residual = np.max(np.abs(A @ v - y), initial=0)
+            return v
+
+        # v <- v + M^{-1} (y - A v) with M = D (Jacobi) or M = D / omega + L (Gauss-Seidel for omega = 1, SOR)
+        if self.method == "jacobi":
+            diagonal = 1 if self.matrix_free else A.diagonal()
+            solve_m = lambda r: r / diagonal
+        else:
+            omega = 1.0 if self.method == "gauss-seidel" else self.omega
+            M = sp.tril(A, k=-1, format="csr") + sp.diags(A.diagonal() / omega, format="csr")
+            solve_m = lambda r: spla.spsolve_triangular(M, r, lower=True)
+
+        self.sweeps = 0
+        while self.residual > target and self.sweeps < self.max_iter:
+            v = v + solve_m(residual)
+            residual = y - A @ v
+            self.residual = np.max(np.abs(residual), initial=0)
+            self.sweeps += 1
+            if not np.isfinite(self.residual):
+                raise np.linalg.LinAlgError(f"{self.method} diverged after {self.sweeps} sweeps")
+        return v
+
+    def _solve_batch(self, P_block, y, gamma):
+        # el sistema diagonal por bloques se itera entero; `residual` y `sweeps` siguen describiendo la política actual
+        # (ModifiedPolicyIteration y `_is_cacheable` dependen de ellos)
+        residual, sweeps = self.residual, self.sweeps
+        try:
+            return self._solve(P_block, y, gamma)
+        finally:
+            self.residual, self.sweeps = residual, sweeps
+
+    def _initial_values(self, n):
+        """
+            :param n: length of the system (a multiple of S for batches of policies)
+            :return: vector from which the iteration starts
+        """
+        if self.warm_start:
+            return np.tile(self._v_array, n // self.n)
+        return np.zeros(n)
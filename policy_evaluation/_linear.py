@@ -1,56 +1,222 @@
 from ._base import PolicyEvaluator
 import numpy as np
-from mdp import get_closed_form_of_mdp
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from scipy.linalg import lu_factor, lu_solve
+from mdp import Policy, get_compiled_form_of_mdp
 
 
 class LinearSystemEvaluator(PolicyEvaluator):
 
-    def __init__(self, mdp, gamma):
-        super().__init__(gamma)
+    SPARSE_SOLVERS = ("direct", "gmres", "bicgstab")
+
+    def __init__(self, mdp, gamma, sparse=False, solver="direct", tol=1e-10, incremental=False, max_rank=16,
+                 cache_size=4, reachable=False):
+        """
+            :param mdp: the MDP whose policies are evaluated
+            :param gamma: discount factor
+            :param sparse: if True, the system (I - gamma * P_pi) is assembled and solved in sparse form
+            :param solver: solver used in sparse mode, one of "direct", "gmres" or "bicgstab"
+            :param tol: relative residual tolerance of the iterative sparse solvers
+            :param incremental: if True, the LU factorization of the system is kept, and policies that differ from the
+                factorized one in at most `max_rank` states are evaluated with a Woodbury low-rank correction
+            :param max_rank: number of changed states beyond which the system is factorized anew
+            :param cache_size: number of evaluations kept in the LRU cache of the evaluator (0 disables it)
+            :param reachable: if True, only the states reachable from `mdp.init_states` are evaluated
+        """
+        super().__init__(gamma, cache_size)
+        if solver not in self.SPARSE_SOLVERS:
+            raise ValueError(f"Unknown solver {solver}, must be one of {self.SPARSE_SOLVERS}.")
+        if incremental and sparse and solver != "direct":
+            raise ValueError("Incremental evaluation requires a direct solver.")
         self.mdp = mdp
-        self.states, self.probs, self.rewards = get_closed_form_of_mdp(mdp)
+        self.reachable = reachable
+        self.sparse = sparse
+        self.solver = solver
+        self.tol = tol
+        self.incremental = incremental
+        self.max_rank = max_rank
+        self.compiled = self._compile(mdp)
+        self.states, self.rewards = self.compiled.states, self.compiled.rewards
         self.n = len(self.states)
+        self._v_array = np.zeros(self.n)
         self._v_values = {s: 0 for s in self.states}  # Inicializar valores de estado en 0
+        self._q_array = None
+        self._actions_in_state = None
+        self.action_indices = None
+        self._pending_action_indices = None  # índices calculados al construir la clave de la caché
+        self.update_rank = None  # número de filas corregidas en la última evaluación incremental (None si fue completa)
+        self._base_gamma = None
+        self._base_actions = None
+        self._base_P = None
+        self._base_solve = None
+        self._base_v = None
+        self._base_columns = {}
 
 
+    def _compile(self, mdp):
+        """
+            :param mdp: the MDP whose policies are evaluated
+            :return: the compiled form of `mdp` on which the evaluator operates
+        """
+        return get_compiled_form_of_mdp(mdp, self.reachable)
+
     def _after_reset(self):
         """
             Update q-values
         """
         gamma_adj = min(self.gamma, 0.9999)
+        compiled = self.compiled
+        self._q_array = None
+        self._q_values = None
 
-        # Crear la matriz A y el vector y
-        A = np.eye(self.n)  # Matriz identidad de tamaño n
-        y = np.zeros(self.n)  # Vector de términos independientes
+        action_indices = self._pending_action_indices
+        if action_indices is None:
+            action_indices = compiled.get_action_indices(self.policy)
+        self._pending_action_indices = None
+        self.action_indices = action_indices
+        for i in np.flatnonzero((action_indices < 0) & ~compiled.terminal):
+            print(f"Warning: Undefined policy for state {compiled.states[i]}.")
 
-        for i, s in enumerate(self.states):
+        # Sistema (I - gamma * P_pi) v = r; las filas de estados terminales o sin acción quedan como v(s) = r(s)
+        P_pi = compiled.get_policy_matrix(action_indices)
 
-            actions = self.mdp.get_actions_in_state(s)
-            if not actions:  # Si es un estado terminal, mantener el valor actual
-                continue
+        try:
+            v_values = self._solve(P_pi, compiled.rewards, gamma_adj)
+            self._v_array = v_values
+            self._v_values = None
+        except np.linalg.LinAlgError as e:
+            print(f"Error solving: {e}")
 
-            action = self.policy(s)
-            if action is None:
-                print(f"Warning: Undefined policy for state {s}.")
-                continue
+    def _cache_key(self, policy):
+        compiled = self.compiled
+        # los índices de una llamada anterior (p. ej. servida desde la caché) nunca deben reutilizarse
+        self._pending_action_indices = None
+        if isinstance(policy, Policy) and policy.compiled.states is compiled.states and policy.compiled.actions == compiled.actions:
+            return policy.fingerprint, self.gamma
+        self._pending_action_indices = compiled.get_action_indices(policy)
+        return Policy(compiled, self._pending_action_indices).fingerprint, self.gamma
 
-            # Actualizar la matriz A y el vector y
-            y[i] = self.rewards[i]
+    def _snapshot(self):
+        return {
+            "action_indices": self.action_indices, "v_array": self._v_array, "q_array": self._q_array,
+            "update_rank": self.update_rank
+        }
 
-            # Coeficiente para s en la ecuación
-            if s in self.probs and action in self.probs[s]:
-                A[i, i] -= gamma_adj * sum(self.probs[s][action].get(s_prime, 0)
-                                         for s_prime in self.states)
-            
-            for j, s_prime in enumerate(self.states):
-                if s_prime in self.probs[s][action]:
-                    A[i, j] += gamma_adj * self.probs[s][action][s_prime]
+    def _restore(self, entry):
+        self.action_indices = entry["action_indices"]
+        self._v_array = entry["v_array"]
+        self._q_array = entry["q_array"]
+        self.update_rank = entry["update_rank"]
+        self._pending_action_indices = None
+        self._v_values = None
+        self._q_values = None
 
-        try: 
-            v_values = np.linalg.solve(A, y)
-            self._v_values = {s: v_values[i] for i, s in enumerate(self.states)}
-        except np.linalg.LinAlgError as e:
-            print(f"Error solving: {e}")
+    def _solve(self, P_pi, y, gamma):
+        """
+            :param P_pi: sparse S x S transition matrix of the current policy
+            :param y: rewards of the states
+            :param gamma: discount factor used in the system
+            :return: solution v of (I - gamma * P_pi) v = y
+        """
+        if self.incremental:
+            return self._solve_incremental(P_pi, y, gamma)
+        if self.sparse:
+            return self._solve_sparse(sp.identity(self.n, format="csr") - gamma * P_pi, y)
+        return np.linalg.solve(np.eye(self.n) - gamma * P_pi.toarray(), y)
+
+    def evaluate_batch(self, policies):
+        """
+            :param policies: list of policies
+            :return: array of shape (len(policies), S) whose k-th row holds the state values of `policies[k]`
+
+            All policies are evaluated at once: their rows are gathered from the compiled transition matrix into one
+            block-diagonal system, identical policies are solved only once, and the current policy is not changed.
+        """
+        compiled = self.compiled
+        action_indices = np.array([compiled.get_action_indices(policy) for policy in policies]).reshape(-1, self.n)
+        unique, inverse = np.unique(action_indices, axis=0, return_inverse=True)
+        P_block = compiled.get_block_policy_matrix(unique)
+        values = self._solve_batch(P_block, np.tile(compiled.rewards, len(unique)), min(self.gamma, 0.9999))
+        return values.reshape(len(unique), self.n)[inverse.ravel()]
+
+    def _solve_batch(self, P_block, y, gamma):
+        """
+            :param P_block: block-diagonal (K S) x (K S) matrix with the transition matrices of K policies
+            :param y: rewards of the states, repeated K times
+            :param gamma: discount factor used in the systems
+            :return: array of length K S with the solutions of the K systems (I - gamma * P_pi) v = r
+        """
+        if self.sparse:
+            return self._solve_sparse(sp.identity(len(y), format="csr") - gamma * P_block, y)
+        # sistemas densos apilados (K x S x S) resueltos con una sola llamada a np.linalg.solve
+        n_policies = len(y) // self.n
+        P_block = P_block.tocoo()
+        P = np.zeros((n_policies, self.n, self.n))
+        P[P_block.row // self.n, P_block.row % self.n, P_block.col % self.n] = P_block.data
+        return np.linalg.solve(np.eye(self.n) - gamma * P, y.reshape(n_policies, self.n, 1)).ravel()
+
+    def _solve_incremental(self, P_pi, y, gamma):
+        """
+            :param P_pi: sparse S x S transition matrix of the current policy
+            :param y: rewards of the states
+            :param gamma: discount factor used in the system
+            :return: solution v of (I - gamma * P_pi) v = y
+
+            If the current policy differs from the factorized one in k <= `max_rank` states, the system equals
+            A_0 + U V^T, where U holds the k affected unit vectors and V^T the k changed rows, and the Woodbury
+            identity gives v = v_0 - Z (I + V^T Z)^{-1} V^T v_0 with Z = A_0^{-1} U.
+        """
+        if self._base_solve is not None and self._base_gamma == gamma:
+            changed = np.flatnonzero(self.action_indices != self._base_actions)
+            if len(changed) <= self.max_rank:
+                self.update_rank = len(changed)
+                if len(changed) == 0:
+                    return self._base_v.copy()
+                missing = [i for i in changed if i not in self._base_columns]
+                if missing:
+                    E = np.zeros((self.n, len(missing)))
+                    E[missing, np.arange(len(missing))] = 1
+                    for i, column in zip(missing, self._base_solve(E).T):
+                        self._base_columns[i] = column
+                Z = np.column_stack([self._base_columns[i] for i in changed])
+                VT = -gamma * (P_pi[changed] - self._base_P[changed])
+                correction = np.linalg.solve(np.eye(len(changed)) + VT @ Z, VT @ self._base_v)
+                return self._base_v - Z @ correction
+
+        # factorizar de nuevo el sistema completo
+        self.update_rank = None
+        if self.sparse:
+            self._base_solve = spla.splu((sp.identity(self.n, format="csc") - gamma * P_pi).tocsc()).solve
+        else:
+            factorization = lu_factor(np.eye(self.n) - gamma * P_pi.toarray())
+            self._base_solve = lambda b: lu_solve(factorization, b)
+        self._base_gamma = gamma
+        self._base_actions = self.action_indices.copy()
+        self._base_P = P_pi
+        self._base_v = self._base_solve(y)
+        self._base_columns = {}
+        return self._base_v.copy()
+
+    def _solve_sparse(self, A, y):
+        """
+            :param A: sparse matrix of the system
+            :param y: right-hand side
+            :return: solution x of A x = y computed with the configured sparse solver
+        """
+        if self.solver == "direct":
+            return spla.spsolve(A.tocsc(), y)
+        method = spla.gmres if self.solver == "gmres" else spla.bicgstab
+        x, info = method(A, y, rtol=self.tol, atol=0)
+        if info != 0:
+            raise np.linalg.LinAlgError(f"{self.solver} did not converge (info={info})")
+        return x
+
+    @property
+    def diagnostics(self):
+        if self.incremental:
+            return {"cache_hit": self.cache_hit, "update_rank": self.update_rank}
+        return {"cache_hit": self.cache_hit}
 
     @property
     def provides_state_values(self):
@@ -58,23 +224,45 @@ class LinearSystemEvaluator(PolicyEvaluator):
 
     @property
     def v(self):
+        if self._v_values is None:
+            self._v_values = dict(zip(self.compiled.states, self._v_array.tolist()))
         return self._v_values
     
+    @property
+    def v_array(self):
+        """
+            :return: array of length S with the state values in the order of `states`
+        """
+        return self._v_array
+
+    @property
+    def q_array(self):
+        """
+            :return: S x A array with q(s, a) = r(s) + gamma * sum_s' P(s'|s,a) v(s'); NaN where `a` is not applicable in `s`
+        """
+        if self._q_array is None:
+            compiled = self.compiled
+            q = compiled.rewards[:, None] + self.gamma * compiled.apply(self._v_array)
+            q[~compiled.available] = np.nan
+            self._q_array = q
+            if self._cache_entry is not None:
+                self._cache_entry["q_array"] = q
+        return self._q_array
+
     @property
     def q(self):
         """
             calcula Q(s,a) a partir de v(s)
         """
-        q_values = {}
-        for s in self.states:
-            actions = self.mdp.get_actions_in_state(s)
-            if not actions:  # Si es un estado terminal, no tendrá valores Q
-                continue
-            q_values[s] = {}
-            for a in actions:
-                if s in self.probs and a in self.probs[s]:
-                    q_values[s][a] = self.rewards[self.states.index(s)] + self.gamma * sum(
-                        self.probs[s][a].get(s_prime, 0) * self._v_values.get(s_prime, 0) for s_prime in self.states
-                    )
-        return q_values
-
+        if self._q_values is None:
+            compiled = self.compiled
+            if self._actions_in_state is None:
+                self._actions_in_state = [
+                    (i, [(j, compiled.actions[j]) for j in np.flatnonzero(compiled.available[i])])
+                    for i in np.flatnonzero(~compiled.terminal)
+                ]
+            q_rows = self.q_array.tolist()
+            self._q_values = {
+                compiled.states[i]: {a: q_rows[i][j] for j, a in actions} for i, actions in self._actions_in_state
+            }
+        return self._q_values
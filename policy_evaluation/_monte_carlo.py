@@ -0,0 +1,208 @@
+from ._base import PolicyEvaluator
+import time
+import numpy as np
+from scipy.stats import norm
+from mdp import get_compiled_form_of_mdp
+
+
+class MonteCarloPolicyEvaluator(PolicyEvaluator):
+    """
+        Estimates v^pi by simulating many episodes at once.
+
+        The positions of all agents are kept in one integer array, and the successor of every agent is sampled in a
+        single vectorized step from the alias tables of the compiled MDP (`CompiledMDP.sample`). The return of an
+        episode starting in s_0 is sum_t gamma^t r(s_t), up to and including the first terminal state (or state without
+        an action), which matches the system solved by `LinearSystemEvaluator`.
+    """
+
+    def __init__(self, mdp, gamma, n_episodes=1000, init_states_only=False, max_steps=1000, confidence=0.95,
+                 batch_size=2**20, seed=None):
+        """
+            :param mdp: the MDP whose policies are evaluated
+            :param gamma: discount factor
+            :param n_episodes: number of episodes simulated from each evaluated state
+            :param init_states_only: if True, only the states in `mdp.init_states` are evaluated
+            :param max_steps: episodes that have not terminated after this many transitions are truncated
+            :param confidence: confidence level of the intervals in `confidence_interval`
+            :param batch_size: maximum number of episodes simulated at the same time
+            :param seed: the seed of the random number generator
+        """
+        super().__init__(gamma)
+        self.mdp = mdp
+        self.n_episodes = n_episodes
+        self.init_states_only = init_states_only
+        self.max_steps = max_steps
+        self.confidence = confidence
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+        self.compiled = get_compiled_form_of_mdp(mdp)
+        self.n = self.compiled.n_states
+        if init_states_only:
+            self.state_indices = np.array([self.compiled.state_index[s] for s in mdp.init_states], dtype=np.int64)
+        else:
+            self.state_indices = np.arange(self.n)
+
+        self.action_indices = None
+        self._v_array = np.full(self.n, np.nan)
+        self._q_array = None
+        self.stderr = np.full(self.n, np.nan)
+        self.mean_episode_length = np.full(self.n, np.nan)
+        self.episode_length_stats = {}
+        self.n_transitions = 0
+        self.truncated = 0
+        self.seconds = 0
+
+    def _simulate(self, starts):
+        """
+            :param starts: integer array with the start state of each episode
+            :return: pair (returns, lengths) with the discounted return and the number of transitions of each episode
+        """
+        compiled = self.compiled
+        rewards = compiled.rewards
+        stops = compiled.terminal | (self.action_indices < 0)
+        returns = np.zeros(len(starts))
+        lengths = np.zeros(len(starts), dtype=np.int64)
+
+        alive = np.arange(len(starts))  # episodios que siguen en curso
+        positions = starts.copy()
+        discount = 1.0
+        for step in range(self.max_steps + 1):
+            returns[alive] += discount * rewards[positions]
+            running = ~stops[positions]
+            alive, positions = alive[running], positions[running]
+            if len(alive) == 0 or step == self.max_steps:
+                break
+            positions = compiled.sample(positions, self.action_indices[positions], self.rng)
+            lengths[alive] += 1
+            discount *= self.gamma
+        self.truncated += len(alive)
+        return returns, lengths
+
+    def _merge_moments(self, counts, means, m2, batch, returns):
+        """
+            :param counts: array of length S with the number of returns accumulated per state so far
+            :param means: array of length S with their means
+            :param m2: array of length S with their sums of squared deviations from the mean
+            :param batch: start states of the episodes of a new batch
+            :param returns: returns of these episodes
+            :return: triple (counts, means, m2) including the batch
+
+            The batch is summarized around its own per-state means and merged with Chan's formula, so no sum of raw
+            squared returns is ever formed (which would cancel catastrophically for returns with a large mean).
+        """
+        batch_counts = np.bincount(batch, minlength=self.n).astype(float)
+        batch_means = np.bincount(batch, weights=returns, minlength=self.n) / np.maximum(batch_counts, 1)
+        batch_m2 = np.bincount(batch, weights=(returns - batch_means[batch]) ** 2, minlength=self.n)
+
+        total = counts + batch_counts
+        delta = batch_means - means
+        share = np.divide(batch_counts, total, out=np.zeros(self.n), where=total > 0)
+        means = means + delta * share
+        m2 = m2 + batch_m2 + delta ** 2 * counts * share
+        return total, means, m2
+
+    def _after_reset(self):
+        """
+            Simulates `n_episodes` episodes from every evaluated state and updates the estimates
+        """
+        start_time = time.perf_counter()
+        compiled = self.compiled
+        self.action_indices = compiled.get_action_indices(self.policy)
+        self._q_array = None
+        self._v_values = None
+        self._q_values = None
+        self.truncated = 0
+
+        starts = np.repeat(self.state_indices, self.n_episodes)
+        counts = np.zeros(self.n)
+        means = np.zeros(self.n)
+        m2 = np.zeros(self.n)  # suma de cuadrados de las desviaciones respecto a la media (Welford/Chan)
+        length_sums = np.zeros(self.n)
+        lengths_all = []
+        for lo in range(0, len(starts), self.batch_size):
+            batch = starts[lo:lo + self.batch_size]
+            returns, lengths = self._simulate(batch)
+            counts, means, m2 = self._merge_moments(counts, means, m2, batch, returns)
+            length_sums += np.bincount(batch, weights=lengths, minlength=self.n)
+            lengths_all.append(lengths)
+
+        n = self.n_episodes
+        evaluated = np.zeros(self.n, dtype=bool)
+        evaluated[self.state_indices] = True
+        self._v_array = np.where(evaluated, means, np.nan)
+        variance = m2 / max(n - 1, 1)
+        self.stderr = np.where(evaluated, np.sqrt(variance / n), np.nan)
+        self.mean_episode_length = np.where(evaluated, length_sums / n, np.nan)
+
+        lengths = np.concatenate(lengths_all) if lengths_all else np.zeros(0, dtype=np.int64)
+        self.n_transitions = int(lengths.sum())
+        self.episode_length_stats = {
+            "mean": float(lengths.mean()) if len(lengths) else 0.0,
+            "std": float(lengths.std()) if len(lengths) else 0.0,
+            "min": int(lengths.min(initial=0)),
+            "max": int(lengths.max(initial=0)),
+            "truncated": self.truncated,
+        }
+        self.seconds = time.perf_counter() - start_time
+
+    @property
+    def confidence_interval(self):
+        """
+            :return: pair (lower, upper) of arrays of length S with the normal-approximation confidence interval of
+                v(s) at level `confidence` (NaN for states that are not evaluated)
+        """
+        z = norm.ppf(0.5 + self.confidence / 2)
+        return self._v_array - z * self.stderr, self._v_array + z * self.stderr
+
+    @property
+    def diagnostics(self):
+        return {
+            "n_transitions": self.n_transitions,
+            "transitions_per_second": self.n_transitions / self.seconds if self.seconds > 0 else None,
+            "mean_episode_length": self.episode_length_stats.get("mean"),
+            "truncated": self.truncated,
+        }
+
+    @property
+    def provides_state_values(self):
+        return True
+
+    @property
+    def v(self):
+        if self._v_values is None:
+            states = self.compiled.states
+            self._v_values = dict(zip([states[i] for i in self.state_indices], self._v_array[self.state_indices].tolist()))
+        return self._v_values
+
+    @property
+    def v_array(self):
+        """
+            :return: array of length S with the estimated state values (NaN for states that are not evaluated)
+        """
+        return self._v_array
+
+    @property
+    def q_array(self):
+        """
+            :return: S x A array with q(s, a) = r(s) + gamma * sum_s' P(s'|s,a) v(s') from the estimated values;
+                NaN where `a` is not applicable in `s` (only available if all states are evaluated)
+        """
+        if self.init_states_only:
+            raise NotImplementedError("q-values need the values of all states; use init_states_only=False.")
+        if self._q_array is None:
+            compiled = self.compiled
+            q = compiled.rewards[:, None] + self.gamma * compiled.apply(self._v_array)
+            q[~compiled.available] = np.nan
+            self._q_array = q
+        return self._q_array
+
+    @property
+    def q(self):
+        if self._q_values is None:
+            compiled = self.compiled
+            q_rows = self.q_array.tolist()
+            self._q_values = {
+                compiled.states[i]: {compiled.actions[j]: q_rows[i][j] for j in np.flatnonzero(compiled.available[i])}
+                for i in np.flatnonzero(~compiled.terminal)
+            }
+        return self._q_values
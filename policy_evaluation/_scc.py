@@ -0,0 +1,139 @@
+from ._linear import LinearSystemEvaluator
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from scipy.sparse.csgraph import breadth_first_order, connected_components
+
+
+class SCCPolicyEvaluator(LinearSystemEvaluator):
+    """
+        Solves (I - gamma * P_pi) v = r component by component.
+
+        The strongly connected components of the graph of P_pi are ordered by their height in the condensation (the
+        length of the longest path to an absorbing component). Components of height 0 are solved first. Every later
+        component only depends on components of smaller height, whose values are already known and are substituted
+        into its right-hand side. All components of the same height are independent and are solved together as one
+        block-diagonal system; a height made only of single states without self-loops needs no solve at all.
+    """
+
+    def __init__(self, mdp, gamma, cache_size=4, reachable=False):
+        """
+            :param mdp: the MDP whose policies are evaluated
+            :param gamma: discount factor
+            :param cache_size: number of evaluations kept in the LRU cache of the evaluator (0 disables it)
+            :param reachable: if True, only the states reachable from `mdp.init_states` are evaluated
+        """
+        super().__init__(mdp, gamma, sparse=True, cache_size=cache_size, reachable=reachable)
+        self.component_labels = None  # componente fuertemente conexa de cada estado bajo la política actual
+        self.n_components = 0
+        self.n_levels = 0
+        self._P_pi = None
+
+    @staticmethod
+    def _prune(P_pi):
+        """
+            :param P_pi: sparse transition matrix
+            :return: CSR copy of `P_pi` without explicitly stored zeros, which csgraph would otherwise treat as edges
+        """
+        P_pi = sp.csr_matrix(P_pi, copy=True)
+        P_pi.eliminate_zeros()
+        return P_pi
+
+    def _decompose(self, P_pi):
+        """
+            :param P_pi: sparse transition matrix of one or more policies, without explicit zeros (see `_prune`)
+            :return: pair (labels, levels) with the component of each state and a list of index arrays, the k-th one
+                holding the states of all components of height k
+        """
+        n_components, labels = connected_components(P_pi, directed=True, connection="strong")
+
+        # grafo de condensación: arista c -> d si algún estado de c pasa a uno de d (c != d)
+        coo = P_pi.tocoo()
+        source, target = labels[coo.row], labels[coo.col]
+        between = source != target
+        edges = np.unique(np.stack([source[between], target[between]]), axis=1)
+        remaining = np.bincount(edges[0], minlength=n_components)  # sucesores aún sin resolver
+        predecessors = sp.csr_matrix(
+            (np.ones(edges.shape[1]), (edges[1], edges[0])), shape=(n_components, n_components)
+        )
+
+        states_of = np.argsort(labels, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_components))])
+        levels = []
+        ready = np.flatnonzero(remaining == 0)
+        while len(ready):
+            lengths = bounds[ready + 1] - bounds[ready]
+            offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            levels.append(states_of[np.repeat(bounds[ready], lengths) + offsets])
+            released = predecessors[ready].indices
+            np.subtract.at(remaining, released, 1)
+            ready = np.unique(released[remaining[released] == 0])
+        return labels, levels
+
+    def _solve_levels(self, P_pi, y, gamma, levels):
+        """
+            :param P_pi: sparse transition matrix in CSR format
+            :param y: right-hand side
+            :param gamma: discount factor used in the system
+            :param levels: index arrays returned by `_decompose`
+            :return: solution v of (I - gamma * P_pi) v = y
+        """
+        v = np.zeros(len(y))
+        for states in levels:
+            P_rows = P_pi[states]
+            # los estados de este nivel aún valen 0 en v, así que solo se suman los sucesores ya resueltos
+            rhs = y[states] + gamma * (P_rows @ v)
+            P_block = P_rows[:, states]
+            if P_block.nnz == P_block.diagonal().astype(bool).sum():
+                v[states] = rhs / (1 - gamma * P_block.diagonal())
+            else:
+                v[states] = spla.spsolve((sp.identity(len(states), format="csc") - gamma * P_block).tocsc(), rhs)
+        return v
+
+    def _solve(self, P_pi, y, gamma):
+        P_pi = self._prune(P_pi)
+        labels, levels = self._decompose(P_pi)
+        self.component_labels = labels
+        self.n_components = int(labels.max(initial=-1)) + 1
+        self.n_levels = len(levels)
+        self._P_pi = P_pi
+        return self._solve_levels(P_pi, y, gamma, levels)
+
+    def _solve_batch(self, P_block, y, gamma):
+        # the policies of a batch are disjoint blocks of the same graph, so they are decomposed together
+        P_block = self._prune(P_block)
+        return self._solve_levels(P_block, y, gamma, self._decompose(P_block)[1])
+
+    def _snapshot(self):
+        entry = super()._snapshot()
+        entry.update(component_labels=self.component_labels, n_components=self.n_components, n_levels=self.n_levels,
+                     P_pi=self._P_pi)
+        return entry
+
+    def _restore(self, entry):
+        super()._restore(entry)
+        self.component_labels = entry["component_labels"]
+        self.n_components = entry["n_components"]
+        self.n_levels = entry["n_levels"]
+        self._P_pi = entry["P_pi"]
+
+    def get_affected_states(self, state_indices):
+        """
+            :param state_indices: indices of states whose action might change
+            :return: sorted array with the indices of all states whose value depends on these states under the current
+                policy (the states themselves and every state from which one of them can be reached)
+        """
+        graph = sp.csr_matrix(self._P_pi.T)
+        affected = np.zeros(self.n, dtype=bool)
+        for i in np.asarray(state_indices).ravel():
+            if not affected[i]:
+                affected[breadth_first_order(graph, i, directed=True, return_predecessors=False)] = True
+        return np.flatnonzero(affected)
+
+    @property
+    def diagnostics(self):
+        largest = int(np.bincount(self.component_labels).max(initial=0)) if self.component_labels is not None else 0
+        return {
+            "cache_hit": self.cache_hit, "n_components": self.n_components, "largest_component": largest,
+            "n_levels": self.n_levels
+        }
@@ -6,13 +6,36 @@ class PolicyImprover(ABC):
     @abstractmethod
     def improve(self, q):
         """
-            :param q: a 2-depth dictionary where q[s][a] = q(s,a)
+            :param q: a 2-depth dictionary where q[s][a] = q(s,a) (or an S x A array if `accepts_arrays` is True)
             :return: True if the policy has been changed, False if not
             
             improves the policy based on current estimates of q accessible
         """
         raise NotImplementedError
 
+    def reset(self, policy):
+        """
+            :param policy: the policy that has been evaluated before the first call of `improve`
+
+            Hook function that tells the improver which policy it starts from, so that the first call of `improve`
+            only changes the states in which that policy can be improved.
+        """
+        pass
+
+    @property
+    def accepts_arrays(self):
+        """
+            True if `improve` also accepts q-values as an S x A array over the compiled state and action indices.
+        """
+        return False
+
+    @property
+    def changed_states(self):
+        """
+            :return: list of the states whose action was changed by the last call of `improve` (None if not tracked)
+        """
+        return None
+
     @property
     @abstractmethod
     def policy(self):
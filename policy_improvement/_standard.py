@@ -1,25 +1,55 @@
 from ._base import PolicyImprover
 import numpy as np
+from mdp import Policy, get_compiled_form_of_mdp
 
 
 class StandardPolicyImprover(PolicyImprover):
 
-    def __init__(self, min_advantage=10**-15):
+    def __init__(self, min_advantage=10**-9, mdp=None, reachable=False, matrix_free=False):
         """
             :param min_advantage: minimum improvement that a q-value must offer over the current state value to trigger a change in policy
+            :param mdp: optional MDP; if given, the improver also accepts S x A arrays of q-values over its compiled form
+            :param reachable: if True, the arrays are over the compiled form of the states reachable from `mdp.init_states`
+                (as produced by an evaluator created with `reachable=True`)
+            :param matrix_free: if True, the arrays are indexed by `mdp.transition_operator`, so that P is not
+                materialized next to a matrix-free evaluator
         """
         self.min_advantage = min_advantage
+        self.compiled = None if mdp is None else get_compiled_form_of_mdp(mdp, reachable, matrix_free)
         self._policy = {}
+        self._actions = None
+        self._reference = None  # política de partida; sus acciones se consultan la primera vez que aparece cada estado
+        self._changed_states = []
+        self.changed_indices = None
+
+    def reset(self, policy):
+        self._policy = {}
+        self._changed_states = []
+        self.changed_indices = None
+        if self.compiled is not None:
+            self._actions = np.array(self.compiled.get_action_indices(policy))
+            self._reference = None
+        else:
+            self._actions = None
+            self._reference = policy
+
+    @property
+    def accepts_arrays(self):
+        return self.compiled is not None
 
     def improve(self, q):
     
         """
-            :param q: a 2-depth dictionary where q[s][a] = q(s,a)
+            :param q: a 2-depth dictionary where q[s][a] = q(s,a), or an S x A array (NaN for inapplicable actions)
             :return: True if the policy has been changed, False if not
             
-            improves the policy based on current estimates of q accessible
+            improves the policy based on current estimates of q accessible; a state only changes its action if the
+            greedy action beats the current one by at least `min_advantage` (ties keep the current action)
         """
-        policy_stable = True
+        if isinstance(q, np.ndarray):
+            return self._improve_array(q)
+
+        self._changed_states = []
         for s, actions in q.items():
             if not actions:
                 print(f"Warning: Empty actions dictionary for state {s}") #debugging
@@ -27,13 +57,61 @@ class StandardPolicyImprover(PolicyImprover):
             
             try:
                 best_action = max(actions, key=actions.get)
-                if s not in self._policy or self._policy[s] != best_action:
+                if s in self._policy:
+                    current_action = self._policy[s]
+                else:
+                    current_action = None if self._reference is None else self._reference(s)
+                if current_action is None or (
+                        best_action != current_action
+                        and actions[best_action] - actions.get(current_action, -np.inf) >= self.min_advantage
+                ):
                     self._policy[s] = best_action
-                    policy_stable = False
+                    self._changed_states.append(s)
+                else:
+                    self._policy[s] = current_action
             except ValueError as e:
                 print(f"Error trying to improve policy for state {s}: {e}")
-        return not policy_stable
+        return len(self._changed_states) > 0
+
+    def _improve_array(self, q):
+        """
+            :param q: S x A array of q-values over the compiled state and action indices
+            :return: True if the policy has been changed, False if not
+        """
+        if self.compiled is None:
+            raise ValueError("Improving from a q-value array requires the improver to be created with an MDP.")
+        available = self.compiled.available
+        n_states = self.compiled.n_states
+        has_action = available.any(axis=1)
+
+        # argmax devuelve la primera acción máxima, así que los empates se resuelven siempre igual
+        q = np.where(available, q, -np.inf)
+        best = np.where(has_action, q.argmax(axis=1), -1)
+        if self._actions is None:
+            current = np.full(n_states, -1)
+        else:
+            current = self._actions
+
+        rows = np.flatnonzero(has_action & (current >= 0))
+        gain = np.zeros(n_states)
+        gain[rows] = q[rows, best[rows]] - q[rows, current[rows]]
+        change = has_action & (best != current) & ((current < 0) | (gain >= self.min_advantage))
+
+        self.changed_indices = np.flatnonzero(change)
+        self._actions = np.where(change, best, current)
+        return len(self.changed_indices) > 0
+
+    @property
+    def changed_states(self):
+        """
+            :return: list of the states whose action was changed by the last call of `improve`
+        """
+        if self.changed_indices is not None and self._actions is not None:
+            return [self.compiled.states[i] for i in self.changed_indices]
+        return list(self._changed_states)
      
     @property
     def policy(self):
+        if self._actions is not None:
+            return Policy(self.compiled, self._actions)
         return lambda s: self._policy.get(s, None)
@@ -1,3 +1,8 @@
 from ._base import PolicyIteration
+from ._standard import StandardPolicyIteration
+from ._modified import ModifiedPolicyIteration
+from ._instrumentation import IterationEvent, IterationLog
+from ._snapshot import PolicySnapshot
 
-__all__ = ["PolicyIteration"]
\ No newline at end of file
+__all__ = ["PolicyIteration", "StandardPolicyIteration", "ModifiedPolicyIteration", "IterationEvent", "IterationLog",
+           "PolicySnapshot"]
\ No newline at end of file
@@ -1,4 +1,12 @@
 from abc import ABC
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from ._instrumentation import IterationEvent
+from ._snapshot import PolicySnapshot
 
 
 class PolicyIteration(ABC):
@@ -6,6 +14,85 @@ class PolicyIteration(ABC):
     def __init__(self, policy_evaluator, policy_improver):
         self.policy_evaluator = policy_evaluator
         self.policy_improver = policy_improver
+        self.callbacks = []
+        self.iteration = 0
+        self._evaluation_seconds = 0
+        self._improvement_seconds = 0
+
+    def add_callback(self, callback):
+        """
+            :param callback: function that receives an `IterationEvent` after every iteration of `run`
+        """
+        self.callbacks.append(callback)
+
+    def _current_q(self):
+        """
+            :return: q-values of the evaluator in the form the improver works with (S x A array if it accepts arrays)
+        """
+        if self.policy_improver.accepts_arrays:
+            return self.policy_evaluator.q_array
+        return self.policy_evaluator.q
+
+    def _improve(self):
+        """
+            :return: True if the improver changed the policy based on the current q-values (timed as improvement)
+        """
+        start = time.perf_counter()
+        improved = self.policy_improver.improve(self._current_q())
+        self._improvement_seconds += time.perf_counter() - start
+        return improved
+
+    def _evaluate(self, policy):
+        """
+            :param policy: policy with which the evaluator is reset (timed as evaluation)
+        """
+        start = time.perf_counter()
+        self.policy_evaluator.reset(policy)
+        self._evaluation_seconds += time.perf_counter() - start
+
+    def _current_values(self):
+        """
+            :return: array with the current state values, or None if the evaluator provides none
+        """
+        if not self.policy_evaluator.provides_state_values:
+            return None
+        try:
+            return np.array(self.policy_evaluator.v_array, dtype=float)
+        except NotImplementedError:
+            return np.array(list(self.policy_evaluator.v.values()), dtype=float)
+
+    def _instrumented_step(self, callbacks=()):
+        """
+            :param callbacks: functions that receive the `IterationEvent` in addition to the registered callbacks
+            :return: the value returned by `step`
+
+            executes `step` and reports it to the callbacks
+        """
+        callbacks = list(self.callbacks) + list(callbacks)
+        if not callbacks:
+            self.iteration += 1
+            return self.step()
+
+        self._evaluation_seconds = 0
+        self._improvement_seconds = 0
+        v_before = self._current_values()
+        improved = self.step()
+        self.iteration += 1
+        v_after = self._current_values()
+
+        changed = self.policy_improver.changed_states
+        event = IterationEvent(
+            iteration=self.iteration,
+            improved=bool(improved),
+            evaluation_seconds=self._evaluation_seconds,
+            improvement_seconds=self._improvement_seconds,
+            n_changed=None if changed is None else len(changed),
+            value_residual=None if v_before is None else float(np.max(np.abs(v_after - v_before), initial=0)),
+            diagnostics=self.policy_evaluator.diagnostics,
+        )
+        for callback in callbacks:
+            callback(event)
+        return improved
 
     def step(self):
         """
@@ -13,13 +100,93 @@ class PolicyIteration(ABC):
         """
         raise NotImplementedError
     
-    def run(self, max_iter=10**6):
+    def run(self, max_iter=10**6, callbacks=()):
         """
             :param max_iter: maximum number of iterations before the algorithm stops
-            tun
+            :param callbacks: functions that receive an `IterationEvent` after every iteration of this run (in
+                addition to those registered with `add_callback`)
+            :return: the final policy
         """
         for _ in range(max_iter):
-            improved = self.step()
+            improved = self._instrumented_step(callbacks)
             if not improved:
                 break
         return self.policy_improver.policy
+
+
+    def _snapshot(self, improved, include_q):
+        """
+            :param improved: value returned by the last step (None before the first one)
+            :param include_q: if True, the q-values and the advantages are included in the snapshot
+            :return: `PolicySnapshot` of the current state of the algorithm
+        """
+        evaluator = self.policy_evaluator
+        v = None
+        if evaluator.provides_state_values:
+            try:
+                v = evaluator.v_array
+            except NotImplementedError:
+                v = np.array(list(evaluator.v.values()), dtype=float)
+        q = advantages = None
+        if include_q:
+            try:
+                q = evaluator.q_array
+                advantages = evaluator.advantage_array
+            except NotImplementedError:
+                pass
+        changed = None if improved is None else self.policy_improver.changed_states
+        policy = evaluator.policy if improved is None else self.policy_improver.policy
+        return PolicySnapshot(self.iteration, improved, v, changed, q, policy, advantages)
+
+    def iterate(self, max_iter=10**6, include_q=False, callbacks=()):
+        """
+            :param max_iter: maximum number of iterations before the algorithm stops
+            :param include_q: if True, the snapshots also hold the q-values and the advantages (computing them if
+                necessary)
+            :param callbacks: functions that receive an `IterationEvent` after every iteration (as in `run`)
+            :return: generator of `PolicySnapshot`s; the first one describes the current evaluation before any step,
+                the following ones are produced after each step until the policy is stable or `max_iter` is reached
+        """
+        yield self._snapshot(None, include_q)
+        for _ in range(max_iter):
+            improved = self._instrumented_step(callbacks)
+            yield self._snapshot(improved, include_q)
+            if not improved:
+                break
+
+    async def aiterate(self, max_iter=10**6, include_q=False, callbacks=()):
+        """
+            Asynchronous variant of `iterate`: the algorithm runs in a worker thread and the snapshots are delivered
+            through an asyncio queue, so neither the event loop nor the solver waits for the other.
+
+            :param max_iter: maximum number of iterations before the algorithm stops
+            :param include_q: if True, the snapshots also hold the q-values and the advantages
+            :param callbacks: functions that receive an `IterationEvent` after every iteration (called in the worker)
+            :return: asynchronous generator of `PolicySnapshot`s
+
+            Errors of the solver are raised by the generator, also when it is closed early; use
+            `contextlib.aclosing` when breaking out of the loop so that this happens right away.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for snapshot in self.iterate(max_iter, include_q, callbacks):
+                    loop.call_soon_threadsafe(queue.put_nowait, snapshot)
+                    if stop.is_set():
+                        break
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while (snapshot := await queue.get()) is not done:
+                yield snapshot
+        finally:
+            # si el consumidor deja de iterar, el solver se detiene tras el paso en curso; se espera siempre al hilo
+            # para no dejarlo suelto y para propagar sus errores (también los del paso que estaba en curso)
+            stop.set()
+            await producer
@@ -0,0 +1,82 @@
+import csv
+import json
+
+
+class IterationEvent:
+    """
+        Report of one iteration of a `PolicyIteration` run.
+    """
+
+    def __init__(self, iteration, improved, evaluation_seconds, improvement_seconds, n_changed, value_residual,
+                 diagnostics):
+        """
+        :param iteration: number of the iteration (starting at 1)
+        :param improved: value returned by `step`
+        :param evaluation_seconds: time spent resetting the evaluator with the new policy
+        :param improvement_seconds: time spent computing q-values and improving the policy
+        :param n_changed: number of states whose action changed (None if the improver does not track it)
+        :param value_residual: max_s |v_t(s) - v_{t-1}(s)| (None if the evaluator provides no state values)
+        :param diagnostics: dictionary with solver diagnostics of the evaluator (residual, sweeps, update rank, ...)
+        """
+        self.iteration = iteration
+        self.improved = improved
+        self.evaluation_seconds = evaluation_seconds
+        self.improvement_seconds = improvement_seconds
+        self.n_changed = n_changed
+        self.value_residual = value_residual
+        self.diagnostics = diagnostics
+
+    def as_dict(self):
+        """
+        :return: flat dictionary with the fields of the event; diagnostics are prefixed with "diagnostics."
+        """
+        record = {
+            "iteration": self.iteration,
+            "improved": self.improved,
+            "evaluation_seconds": self.evaluation_seconds,
+            "improvement_seconds": self.improvement_seconds,
+            "n_changed": self.n_changed,
+            "value_residual": self.value_residual,
+        }
+        for key, value in self.diagnostics.items():
+            record[f"diagnostics.{key}"] = value
+        return record
+
+
+class IterationLog:
+    """
+        Callback that collects the `IterationEvent`s of one or more runs and exports them to JSON or CSV.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+    @property
+    def records(self):
+        """
+        :return: list with one flat dictionary per collected event
+        """
+        return [event.as_dict() for event in self.events]
+
+    def to_json(self, path):
+        """
+        :param path: file to which the events are written as a JSON list
+        """
+        with open(path, "w") as f:
+            json.dump(self.records, f, indent=2)
+
+    def to_csv(self, path):
+        """
+        :param path: file to which the events are written as CSV (one column per field or diagnostic)
+        """
+        records = self.records
+        fields = []
+        for record in records:
+            fields += [key for key in record if key not in fields]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(records)
@@ -0,0 +1,49 @@
+from ._standard import StandardPolicyIteration
+
+
+class ModifiedPolicyIteration(StandardPolicyIteration):
+    def __init__(self, init_policy, policy_evaluator, policy_improver, k=5, adaptive=False, adaptive_ratio=0.1):
+        """
+        :param init_policy: policy with which the algorithm is initialized
+        :param policy_evaluator: an iterative policy evaluator (e.g. `IterativePolicyEvaluator`); while this algorithm
+            evaluates a policy, it runs with warm starts and the settings below, and its own `warm_start`, `max_iter`
+            and `relative_tol` are restored afterwards
+        :param policy_improver: the policy improver
+        :param k: number of sweeps of each partial evaluation (maximum number of sweeps if `adaptive` is True)
+        :param adaptive: if True, an evaluation stops as soon as it has reduced the residual by `adaptive_ratio`
+        :param adaptive_ratio: residual reduction that ends an adaptive evaluation
+        """
+        self.k = k
+        self.adaptive = adaptive
+        self.adaptive_ratio = adaptive_ratio
+        super().__init__(init_policy, policy_evaluator, policy_improver)
+
+    def _evaluate(self, policy):
+        """
+            :param policy: policy with which the evaluator is reset for a partial evaluation
+        """
+        evaluator = self.policy_evaluator
+        settings = {
+            "warm_start": True, "max_iter": self.k, "relative_tol": self.adaptive_ratio if self.adaptive else 0
+        }
+        previous = {name: getattr(evaluator, name) for name in settings}
+        for name, value in settings.items():
+            setattr(evaluator, name, value)
+        try:
+            super()._evaluate(policy)
+        finally:
+            for name, value in previous.items():
+                setattr(evaluator, name, value)
+
+    def step(self):
+        """
+        :return: True if the policy was improved or its evaluation has not converged yet, False otherwise
+        """
+        improved = self._improve()
+        evaluation_pending = self.policy_evaluator.residual > self.policy_evaluator.tol
+
+        # continuar la evaluación desde los valores anteriores, también si la política no cambió
+        if improved or evaluation_pending:
+            self._evaluate(self.policy_improver.policy)
+
+        return improved or evaluation_pending
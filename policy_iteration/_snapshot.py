@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def _read_only(array):
+    """
+    :param array: array owned by an evaluator (evaluators replace their arrays instead of writing into them)
+    :return: read-only view of `array`, or None
+    """
+    if array is None:
+        return None
+    view = np.asarray(array).view()
+    view.setflags(write=False)
+    return view
+
+
+class PolicySnapshot:
+    """
+        Read-only view of the state of a `PolicyIteration` after one of its iterations.
+
+        The arrays are read-only views of the arrays of the evaluator at that moment; since evaluators replace their
+        arrays on every evaluation instead of writing into them, a snapshot stays valid after later iterations.
+    """
+
+    def __init__(self, iteration, improved, v, changed_states=None, q=None, policy=None, advantages=None):
+        """
+        :param iteration: number of executed iterations (0 for the evaluation of the initial policy)
+        :param improved: value returned by the step of this iteration (None for iteration 0)
+        :param v: array with the state values over the compiled state index (None if the evaluator provides none)
+        :param changed_states: states whose action was changed in this iteration (None if not tracked)
+        :param q: optional S x A array with the q-values
+        :param policy: the policy of the improver after this iteration
+        :param advantages: optional S x A array with the advantages A(s, a) = q(s, a) - v(s) (see
+            `PolicyEvaluator.advantage_array`)
+        """
+        self.iteration = iteration
+        self.improved = improved
+        self.v = _read_only(v)
+        self.changed_states = changed_states
+        self.q = _read_only(q)
+        self.policy = policy
+        self.advantages = _read_only(advantages)
+
+    def __repr__(self):
+        n_changed = None if self.changed_states is None else len(self.changed_states)
+        return f"PolicySnapshot(iteration={self.iteration}, improved={self.improved}, n_changed={n_changed})"
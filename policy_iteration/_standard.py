@@ -8,20 +8,18 @@ class StandardPolicyIteration(PolicyIteration):
         :param policy_improver: the policy improver
         """
         super().__init__(policy_evaluator, policy_improver)
-        self.policy_evaluator.reset(init_policy)
+        self._evaluate(init_policy)
+        self.policy_improver.reset(init_policy)
     
     def step(self):
         """
         :return: True if the policy was improved, False otherwise
         """
-        # Obtener los valores Q actuales
-        q_values = self.policy_evaluator.q
-        
-        # Mejorar la política basada en los valores Q
-        improved = self.policy_improver.improve(q_values)
+        # Mejorar la política basada en los valores Q actuales
+        improved = self._improve()
         
         # Resetear el evaluador con la nueva política
         if improved:
-            self.policy_evaluator.reset(self.policy_improver.policy)
+            self._evaluate(self.policy_improver.policy)
         
         return improved
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""
+Barrido paralelo de hiperparámetros de policy iteration
+- Recorre la rejilla (mundo, gamma, probability_of_success, recompensas, política inicial) en un pool de procesos
+- La matriz de transición compilada de cada mundo se coloca una sola vez en memoria compartida, de modo que los
+  procesos no la reciben serializada ni la vuelven a construir
+- Devuelve los resultados como una única tabla (pandas.DataFrame)
+
+Uso: python sweep.py --sizes 4 10 --gammas 0.9 0.95 0.99 --probabilities 0.8 1.0 --init-policies random u r d l
+"""
+
+import argparse
+import itertools as it
+import multiprocessing as mp
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from mdp import CompiledMDP, Policy, get_compiled_form_of_mdp, get_random_policy
+from lake import LakeMDP
+from policy_evaluation import LinearSystemEvaluator
+from policy_improvement._standard import StandardPolicyImprover
+from policy_iteration import StandardPolicyIteration
+
+DEFAULT_REWARDS = {"standard_reward": -0.1, "penalty_for_hole": -100, "reward_for_goal": 0}
+
+# bloques compartidos ya adjuntados en este proceso: nombre del bloque -> SharedMemory
+_attached = {}
+
+
+def _attach(name):
+    """
+    Adjunta un bloque de memoria compartida creado por otro proceso sin hacerse cargo de liberarlo.
+
+    Los procesos del pool comparten el resource tracker del proceso principal, que es quien creó el bloque y lo
+    libera en `SharedWorld.close`. Desde Python 3.13 el bloque se adjunta sin registrarlo; en versiones anteriores
+    se registra de nuevo, lo que no tiene efecto porque el tracker guarda los nombres en un conjunto.
+
+    :param name: nombre del bloque
+    :return: el SharedMemory adjuntado
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedWorld:
+    """
+    Mundo y matriz de transición CSR de un LakeMDP compilado, copiados en bloques de memoria compartida.
+    Al enviar el objeto a un proceso solo viajan los nombres, formas y tipos de los bloques.
+    """
+
+    def __init__(self, world, probability_of_success):
+        """
+        :param world: array con 1 en los agujeros
+        :param probability_of_success: probabilidad de que el movimiento elegido tenga éxito
+        """
+        mdp = LakeMDP(world=world, probability_of_success=probability_of_success)
+        transitions = get_compiled_form_of_mdp(mdp).transitions
+        arrays = {
+            "world": np.asarray(world), "data": transitions.data, "indices": transitions.indices,
+            "indptr": transitions.indptr
+        }
+        self.probability_of_success = probability_of_success
+        self.layout = {}
+        self._blocks = []
+        for key, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            self.layout[key] = (block.name, array.shape, array.dtype.str)
+
+    def __getstate__(self):
+        return {"probability_of_success": self.probability_of_success, "layout": self.layout, "_blocks": []}
+
+    def arrays(self):
+        """
+        :return: diccionario con vistas (sin copia) de los arrays compartidos
+        """
+        views = {}
+        own = {block.name: block for block in self._blocks}
+        for key, (name, shape, dtype) in self.layout.items():
+            if name in own:
+                views[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=own[name].buf)
+                continue
+            if name not in _attached:
+                _attached[name] = _attach(name)
+            views[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_attached[name].buf)
+        return views
+
+    def make_mdp(self, rewards):
+        """
+        :param rewards: diccionario con standard_reward, penalty_for_hole y reward_for_goal
+        :return: LakeMDP cuya forma compilada usa la matriz de transición compartida
+        """
+        arrays = self.arrays()
+        mdp = LakeMDP(world=arrays["world"], probability_of_success=self.probability_of_success, **rewards)
+        n_states, n_actions = arrays["world"].size, len(mdp.actions_)
+        transitions = sp.csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]), shape=(n_states * n_actions, n_states), copy=False
+        )
+        available = np.repeat(~mdp.terminal[:, None], n_actions, axis=1)
+        mdp._compiled_form = CompiledMDP(mdp.states_, mdp.actions_, transitions, mdp.reward_array, available, mdp.terminal)
+        return mdp
+
+    def close(self):
+        """Libera los bloques de memoria compartida (solo en el proceso que los creó)"""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def make_init_policy(mdp, name, seed=0):
+    """
+    :param mdp: el LakeMDP
+    :param name: "random" o una acción ('u', 'r', 'd', 'l') que se elige en todos los estados donde es aplicable
+    :param seed: semilla de la política aleatoria
+    :return: la política inicial
+    """
+    if name == "random":
+        return get_random_policy(mdp, seed=seed)
+    compiled = get_compiled_form_of_mdp(mdp)
+    preferred = compiled.available[:, compiled.action_index[name]]
+    action_indices = np.where(preferred, compiled.action_index[name], compiled.available.argmax(axis=1))
+    action_indices[compiled.terminal] = -1
+    return Policy(compiled, action_indices)
+
+
+def run_setting(setting):
+    """
+    Ejecuta policy iteration para una combinación de la rejilla (se llama dentro de los procesos trabajadores).
+
+    :param setting: diccionario con world_name, shared (SharedWorld), gamma, rewards, init_policy, seed y max_iter
+    :return: registro con los parámetros y los resultados de la ejecución
+    """
+    start = time.perf_counter()
+    shared = setting["shared"]
+    mdp = shared.make_mdp(setting["rewards"])
+    evaluator = LinearSystemEvaluator(mdp, setting["gamma"], sparse=True)
+    policy_iteration = StandardPolicyIteration(
+        make_init_policy(mdp, setting["init_policy"], setting["seed"]), evaluator, StandardPolicyImprover(mdp=mdp)
+    )
+    iterations = 0
+    for iterations in range(1, setting["max_iter"] + 1):
+        if not policy_iteration.step():
+            break
+    policy = policy_iteration.policy_improver.policy
+    compiled = evaluator.compiled
+    v = evaluator.v_array
+    start_index = compiled.state_index[mdp.init_states[0]]
+    return {
+        "world": setting["world_name"], "n_states": compiled.n_states, "gamma": setting["gamma"],
+        "probability_of_success": shared.probability_of_success, **setting["rewards"],
+        "init_policy": setting["init_policy"], "iterations": iterations, "seconds": time.perf_counter() - start,
+        "start_value": float(v[start_index]), "mean_value": float(v[~compiled.terminal].mean()),
+        "policy": "".join(compiled.actions[j] if j >= 0 else "x" for j in compiled.get_action_indices(policy)),
+    }
+
+
+def run_sweep(worlds, gammas, probabilities=(0.8,), rewards=(DEFAULT_REWARDS,), init_policies=("random",), seed=0,
+              max_iter=1000, processes=None):
+    """
+    Ejecuta todas las combinaciones de la rejilla en un pool de procesos.
+
+    :param worlds: diccionario nombre -> array del mundo
+    :param gammas: factores de descuento
+    :param probabilities: valores de probability_of_success
+    :param rewards: diccionarios con standard_reward, penalty_for_hole y reward_for_goal
+    :param init_policies: nombres de las políticas iniciales (ver `make_init_policy`)
+    :param seed: semilla de las políticas iniciales aleatorias
+    :param max_iter: número máximo de iteraciones de cada ejecución
+    :param processes: número de procesos (todos los núcleos si es None; 1 ejecuta en el proceso actual)
+    :return: DataFrame con una fila por combinación
+    """
+    # la matriz de transición solo depende del mundo y de probability_of_success
+    shared = {
+        (name, p): SharedWorld(world, p) for (name, world), p in it.product(worlds.items(), probabilities)
+    }
+    settings = [
+        {"world_name": name, "shared": shared[name, p], "gamma": gamma, "rewards": dict(r), "init_policy": init,
+         "seed": seed, "max_iter": max_iter}
+        for name, p, gamma, r, init in it.product(worlds, probabilities, gammas, rewards, init_policies)
+    ]
+    try:
+        if processes == 1:
+            records = [run_setting(setting) for setting in settings]
+        else:
+            with mp.Pool(processes) as pool:
+                records = pool.map(run_setting, settings, chunksize=1)
+    finally:
+        for world in shared.values():
+            world.close()
+        _attached.clear()
+    return pd.DataFrame(records)
+
+
+def main():
+    """Función principal del barrido"""
+    from benchmark import generate_lake_world
+
+    parser = argparse.ArgumentParser(description="Barrido paralelo de hiperparámetros de policy iteration")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 10])
+    parser.add_argument("--gammas", type=float, nargs="+", default=[0.9, 0.95, 0.99])
+    parser.add_argument("--probabilities", type=float, nargs="+", default=[0.8])
+    parser.add_argument("--standard-rewards", type=float, nargs="+", default=[DEFAULT_REWARDS["standard_reward"]])
+    parser.add_argument("--init-policies", nargs="+", default=["random", "u", "r", "d", "l"])
+    parser.add_argument("--max-iter", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    worlds = {f"{size}x{size}": generate_lake_world(size, seed=args.seed) for size in args.sizes}
+    rewards = [dict(DEFAULT_REWARDS, standard_reward=r) for r in args.standard_rewards]
+    table = run_sweep(
+        worlds, args.gammas, args.probabilities, rewards, args.init_policies, args.seed, args.max_iter, args.processes
+    )
+    table.to_csv(args.output, index=False)
+    print(table.drop(columns="policy").to_string(index=False))
+    print(f"\nResultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
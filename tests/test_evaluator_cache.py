@@ -0,0 +1,27 @@
+import numpy as np
+
+from lake import LakeMDP
+from large_lake import large_lake_world
+from mdp import Policy, get_compiled_form_of_mdp, get_random_policy
+from policy_evaluation import LinearSystemEvaluator
+
+
+def test_cache_hit_does_not_leak_action_indices():
+    # reset(callable) -> reset(mismo callable) -> reset(Policy) debe evaluar la última política, no la primera
+    mdp = LakeMDP(world=large_lake_world)
+    compiled = get_compiled_form_of_mdp(mdp)
+    first = get_random_policy(mdp, seed=0)
+    callable_policy = lambda s: first(s)
+    second = get_random_policy(mdp, seed=1)
+    assert isinstance(second, Policy)
+
+    evaluator = LinearSystemEvaluator(mdp, 0.95, sparse=True)
+    evaluator.reset(callable_policy)
+    evaluator.reset(callable_policy)
+    assert evaluator.cache_hit
+    evaluator.reset(second)
+
+    reference = LinearSystemEvaluator(mdp, 0.95, sparse=True, cache_size=0)
+    reference.reset(second)
+    assert np.array_equal(evaluator.action_indices, compiled.get_action_indices(second))
+    assert np.allclose(evaluator.v_array, reference.v_array)
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from lake import LakeMDP
+from large_lake import large_lake_world
+from mdp import get_compiled_form_of_mdp, get_random_policies, get_random_policy, Policy
+from policy_evaluation import (
+    IterativePolicyEvaluator, LinearSystemEvaluator, MonteCarloPolicyEvaluator, SCCPolicyEvaluator
+)
+
+GAMMA = 0.95
+
+
+@pytest.fixture(scope="module")
+def lake():
+    return LakeMDP(world=large_lake_world)
+
+
+@pytest.fixture(scope="module")
+def policies(lake):
+    return get_random_policies(lake, 4, seed=0)
+
+
+def _dense_values(lake, policy):
+    evaluator = LinearSystemEvaluator(lake, GAMMA, cache_size=0)
+    evaluator.reset(policy)
+    return evaluator.v_array
+
+
+@pytest.mark.parametrize("make", [
+    lambda mdp: LinearSystemEvaluator(mdp, GAMMA, sparse=True),
+    lambda mdp: LinearSystemEvaluator(mdp, GAMMA, sparse=True, solver="gmres", tol=1e-12),
+    lambda mdp: IterativePolicyEvaluator(mdp, GAMMA, method="gauss-seidel", tol=1e-10),
+    lambda mdp: IterativePolicyEvaluator(mdp, GAMMA, method="gmres", tol=1e-10, matrix_free=True),
+    lambda mdp: SCCPolicyEvaluator(mdp, GAMMA),
+], ids=["sparse", "sparse-gmres", "gauss-seidel", "matrix-free-gmres", "scc"])
+def test_backends_match_dense(lake, policies, make):
+    evaluator = make(lake)
+    for policy in policies:
+        evaluator.reset(policy)
+        assert np.allclose(evaluator.v_array, _dense_values(lake, policy), atol=1e-7)
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_incremental_woodbury_updates_match_dense(lake, sparse):
+    compiled = get_compiled_form_of_mdp(lake)
+    evaluator = LinearSystemEvaluator(lake, GAMMA, sparse=sparse, incremental=True, max_rank=8, cache_size=0)
+    rs = np.random.RandomState(1)
+    base_actions = get_random_policy(lake, seed=1).action_indices
+    evaluator.reset(Policy(compiled, base_actions))
+    for n_changed in [1, 3, 8, 20]:
+        # cambiar la acción de algunos estados no terminales respecto a la política factorizada
+        states = rs.choice(np.flatnonzero(~compiled.terminal), n_changed, replace=False)
+        action_indices = np.array(base_actions)
+        action_indices[states] = (action_indices[states] + 1) % compiled.n_actions
+        policy = Policy(compiled, action_indices)
+        evaluator.reset(policy)
+        assert evaluator.update_rank == (n_changed if n_changed <= 8 else None)
+        assert np.allclose(evaluator.v_array, _dense_values(lake, policy), atol=1e-9)
+
+
+@pytest.mark.parametrize("make", [
+    lambda mdp: LinearSystemEvaluator(mdp, GAMMA),
+    lambda mdp: LinearSystemEvaluator(mdp, GAMMA, sparse=True),
+    lambda mdp: IterativePolicyEvaluator(mdp, GAMMA, method="jacobi", tol=1e-10),
+    lambda mdp: SCCPolicyEvaluator(mdp, GAMMA),
+], ids=["dense", "sparse", "jacobi", "scc"])
+def test_evaluate_batch_matches_dense_and_keeps_current_policy(lake, policies, make):
+    evaluator = make(lake)
+    evaluator.reset(policies[0])
+    current = np.array(evaluator.v_array)
+    values = evaluator.evaluate_batch(policies + policies[:1])
+    expected = np.array([_dense_values(lake, policy) for policy in policies + policies[:1]])
+    assert np.allclose(values, expected, atol=1e-7)
+    assert evaluator.policy is policies[0]
+    assert np.array_equal(evaluator.v_array, current)
+
+
+def test_reachable_evaluation_matches_full_evaluation(lake, policies):
+    evaluator = LinearSystemEvaluator(lake, GAMMA, reachable=True)
+    full = get_compiled_form_of_mdp(lake)
+    restricted = evaluator.compiled
+    assert restricted.n_states < full.n_states
+    indices = [full.state_index[s] for s in restricted.states]
+    for policy in policies:
+        evaluator.reset(policy)
+        assert np.allclose(evaluator.v_array, _dense_values(lake, policy)[indices], atol=1e-9)
+
+
+def test_alias_sampler_frequencies_match_transition_probabilities(lake):
+    compiled = get_compiled_form_of_mdp(lake)
+    rng = np.random.default_rng(0)
+    n_samples = 200_000
+    for s in np.flatnonzero(~compiled.terminal)[[0, 10, 40]]:
+        for j in range(compiled.n_actions):
+            successors = compiled.sample(np.full(n_samples, s), np.full(n_samples, j), rng)
+            frequencies = np.bincount(successors, minlength=compiled.n_states) / n_samples
+            expected = compiled.transitions[s * compiled.n_actions + j].toarray().ravel()
+            assert np.abs(frequencies - expected).max() < 0.01
+            assert np.all(frequencies[expected == 0] == 0)
+
+
+def test_monte_carlo_confidence_intervals_cover_exact_values(lake):
+    policy = get_random_policy(lake, seed=2)
+    evaluator = MonteCarloPolicyEvaluator(lake, GAMMA, n_episodes=2000, seed=0)
+    evaluator.reset(policy)
+    lower, upper = evaluator.confidence_interval
+    exact = _dense_values(lake, policy)
+    coverage = np.mean((lower <= exact) & (exact <= upper))
+    assert coverage > 0.85
+    assert np.allclose(evaluator.v_array, exact, atol=6 * np.nanmax(evaluator.stderr))
@@ -0,0 +1,42 @@
+import numpy as np
+
+from lake import LakeMDP
+from large_lake import large_lake_world
+from mdp import get_compiled_form_of_mdp, get_random_policy
+from policy_evaluation import LinearSystemEvaluator
+from policy_improvement._standard import StandardPolicyImprover
+from policy_iteration import StandardPolicyIteration
+
+
+def _expected_changes(evaluator, init_actions, min_advantage):
+    # estados cuya acción greedy supera a la inicial en al menos min_advantage
+    q = np.where(np.isnan(evaluator.q_array), -np.inf, evaluator.q_array)
+    rows = np.flatnonzero(init_actions >= 0)
+    best = q[rows].argmax(axis=1)
+    gain = q[rows, best] - q[rows, init_actions[rows]]
+    return rows[(best != init_actions[rows]) & (gain >= min_advantage)]
+
+
+def test_first_iteration_only_reports_improvable_states():
+    mdp = LakeMDP(world=large_lake_world)
+    compiled = get_compiled_form_of_mdp(mdp)
+    init = get_random_policy(mdp, seed=0)
+    evaluator = LinearSystemEvaluator(mdp, 0.95)
+    min_advantage = 0.5
+    policy_iteration = StandardPolicyIteration(init, evaluator, StandardPolicyImprover(min_advantage, mdp=mdp))
+    expected = _expected_changes(evaluator, compiled.get_action_indices(init), min_advantage)
+    assert 0 < len(expected) < np.count_nonzero(~compiled.terminal)
+
+    policy_iteration.step()
+    assert np.array_equal(policy_iteration.policy_improver.changed_indices, expected)
+
+
+def test_first_iteration_dict_path_matches_array_path():
+    mdp = LakeMDP(world=large_lake_world)
+    compiled = get_compiled_form_of_mdp(mdp)
+    init = get_random_policy(mdp, seed=0)
+    policy_iteration = StandardPolicyIteration(init, LinearSystemEvaluator(mdp, 0.95), StandardPolicyImprover(0.5))
+    expected = _expected_changes(policy_iteration.policy_evaluator, compiled.get_action_indices(init), 0.5)
+
+    policy_iteration.step()
+    assert sorted(policy_iteration.policy_improver.changed_states) == sorted(compiled.states[i] for i in expected)
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from contextlib import aclosing
+
+import numpy as np
+import pytest
+
+from lake import LakeMDP
+from large_lake import large_lake_world
+from mdp import get_random_policy
+from policy_evaluation import IterativePolicyEvaluator, LinearSystemEvaluator
+from policy_improvement._standard import StandardPolicyImprover
+from policy_iteration import ModifiedPolicyIteration, StandardPolicyIteration
+
+
+class FailingEvaluator(LinearSystemEvaluator):
+    """evaluador que falla a partir de la segunda evaluación (y lo avisa con `failed`)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failed = threading.Event()
+
+    def _after_reset(self):
+        if self.action_indices is not None:
+            self.failed.set()
+            raise RuntimeError("solver failed")
+        super()._after_reset()
+
+
+def test_aiterate_surfaces_solver_error_after_early_break():
+    mdp = LakeMDP(world=large_lake_world)
+    evaluator = FailingEvaluator(mdp, 0.95, cache_size=0)
+    policy_iteration = StandardPolicyIteration(get_random_policy(mdp, seed=0), evaluator, StandardPolicyImprover(mdp=mdp))
+
+    async def consume():
+        async with aclosing(policy_iteration.aiterate()) as snapshots:
+            async for snapshot in snapshots:
+                assert snapshot.iteration == 0
+                # se deja de iterar cuando el paso 1 ya ha fallado en el hilo del solver
+                await asyncio.to_thread(evaluator.failed.wait)
+                break
+
+    with pytest.raises(RuntimeError, match="solver failed"):
+        asyncio.run(consume())
+
+
+def test_aiterate_yields_same_snapshots_as_iterate():
+    mdp = LakeMDP(world=large_lake_world)
+
+    def make():
+        return StandardPolicyIteration(
+            get_random_policy(mdp, seed=0), LinearSystemEvaluator(mdp, 0.95), StandardPolicyImprover(mdp=mdp)
+        )
+
+    async def collect():
+        return [snapshot.iteration async for snapshot in make().aiterate()]
+
+    assert asyncio.run(collect()) == [snapshot.iteration for snapshot in make().iterate()]
+
+
+def test_modified_policy_iteration_restores_evaluator_settings():
+    mdp = LakeMDP(world=large_lake_world)
+    evaluator = IterativePolicyEvaluator(mdp, 0.95, method="jacobi", max_iter=10**4)
+    policy_iteration = ModifiedPolicyIteration(
+        get_random_policy(mdp, seed=0), evaluator, StandardPolicyImprover(mdp=mdp), k=5, adaptive=True
+    )
+    assert evaluator.sweeps <= 5
+    policy_iteration.run()
+    assert (evaluator.warm_start, evaluator.max_iter, evaluator.relative_tol) == (False, 10**4, 0)
+
+    # reutilizado después, el evaluador vuelve a resolver hasta `tol`
+    reference = LinearSystemEvaluator(mdp, 0.95)
+    policy = get_random_policy(mdp, seed=1)
+    evaluator.reset(policy)
+    reference.reset(policy)
+    assert evaluator.residual <= evaluator.tol
+    assert np.allclose(evaluator.v_array, reference.v_array, atol=1e-6)
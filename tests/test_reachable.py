@@ -0,0 +1,46 @@
+import numpy as np
+import scipy.sparse as sp
+
+from mdp import MDP, CompiledMDP
+
+
+class ChainMDP(MDP):
+    """a -> b con probabilidad 1; la distribución también nombra a c con probabilidad 0"""
+
+    @property
+    def init_states(self):
+        return ["a"]
+
+    @property
+    def states(self):
+        return ["a", "b", "c"]
+
+    def get_actions_in_state(self, s):
+        return [] if s == "b" else ["x"]
+
+    def get_reward(self, s):
+        return {"a": -1.0, "b": 0.0, "c": 5.0}[s]
+
+    def get_transition_distribution(self, s, a):
+        return {"b": 1.0, "c": 0.0} if s == "a" else {"c": 1.0}
+
+
+def test_explicit_zero_entries_are_not_edges():
+    # fila a: ceros explícitos hacia c; c solo es alcanzable a través de ese cero
+    transitions = sp.csr_matrix(
+        (np.array([1.0, 0.0, 1.0]), np.array([1, 2, 2]), np.array([0, 2, 2, 3])), shape=(3, 3)
+    )
+    assert transitions.nnz == 3
+    compiled = CompiledMDP(
+        ["a", "b", "c"], ["x"], transitions, np.array([-1.0, 0.0, 5.0]), np.array([[True], [False], [True]]),
+        np.array([False, True, False])
+    )
+    reachable = compiled.get_reachable_states([0])
+    assert reachable.tolist() == [0, 1]
+    assert compiled.restrict(reachable).states == ["a", "b"]
+
+
+def test_from_reachable_skips_zero_probability_successors():
+    mdp = ChainMDP()
+    assert mdp.compile(reachable=True).states == ["a", "b"]
+    assert CompiledMDP.from_mdp(mdp).n_states == 3
@@ -0,0 +1,4 @@
+from ._base import ValueIteration
+from ._standard import StandardValueIteration
+
+__all__ = ["ValueIteration", "StandardValueIteration"]
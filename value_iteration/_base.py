@@ -0,0 +1,32 @@
+from abc import ABC
+
+
+class ValueIteration(ABC):
+
+    def __init__(self, mdp, gamma):
+        self.mdp = mdp
+        self.gamma = gamma
+
+    def step(self):
+        """
+            executes one Bellman backup over all states
+        """
+        raise NotImplementedError
+
+    @property
+    def policy(self):
+        """
+            :return: function that maps a state to the greedy action w.r.t. the current state values
+        """
+        raise NotImplementedError
+
+    def run(self, max_iter=10**6):
+        """
+            :param max_iter: maximum number of backups before the algorithm stops
+            :return: the greedy policy w.r.t. the final state values
+        """
+        for _ in range(max_iter):
+            changed = self.step()
+            if not changed:
+                break
+        return self.policy
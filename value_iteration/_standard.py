@@ -0,0 +1,70 @@
+from ._base import ValueIteration
+import numpy as np
+from mdp import get_compiled_form_of_mdp
+from mdp._mdp_utils import get_policy_from_dict
+
+
+class StandardValueIteration(ValueIteration):
+
+    CRITERIA = ("span", "residual")
+
+    def __init__(self, mdp, gamma, tol=1e-8, criterion="span", matrix_free=False):
+        """
+        :param mdp: the MDP to be solved
+        :param gamma: discount factor
+        :param tol: the iteration stops once the change of the state values between two backups is below `tol`
+        :param criterion: "span" measures the change as max - min of v_{t+1} - v_t, "residual" as its maximum norm
+        :param matrix_free: if True, backups use `mdp.transition_operator` and the transition matrix is never materialized
+        """
+        super().__init__(mdp, gamma)
+        if criterion not in self.CRITERIA:
+            raise ValueError(f"Unknown criterion {criterion}, must be one of {self.CRITERIA}.")
+        self.tol = tol
+        self.criterion = criterion
+        self.compiled = mdp.transition_operator if matrix_free else get_compiled_form_of_mdp(mdp)
+        self.iterations = 0
+        self.residual = np.inf
+        self._v_array = self.compiled.rewards.copy()
+
+    def _backup(self, v):
+        """
+        :param v: array of state values
+        :return: S x A array with r(s) + gamma * sum_s' P(s'|s,a) v(s'); -inf where `a` is not applicable in `s`
+        """
+        compiled = self.compiled
+        q = compiled.rewards[:, None] + self.gamma * compiled.apply(v)
+        q[~compiled.available] = -np.inf
+        return q
+
+    def step(self):
+        """
+        :return: True if the state values have not converged yet, False otherwise
+        """
+        compiled = self.compiled
+        q = self._backup(self._v_array)
+        v = np.where(compiled.terminal, compiled.rewards, q.max(axis=1, initial=-np.inf))
+        diff = v - self._v_array
+        if self.criterion == "span":
+            self.residual = diff.max(initial=0) - diff.min(initial=0)
+        else:
+            self.residual = np.abs(diff).max(initial=0)
+        self._v_array = v
+        self.iterations += 1
+        return self.residual >= self.tol
+
+    @property
+    def v(self):
+        return {s: v for s, v in zip(self.compiled.states, self._v_array.tolist())}
+
+    @property
+    def v_array(self):
+        return self._v_array
+
+    @property
+    def policy(self):
+        compiled = self.compiled
+        q = self._backup(self._v_array)
+        greedy = q.argmax(axis=1)
+        return get_policy_from_dict({
+            compiled.states[i]: compiled.actions[greedy[i]] for i in np.flatnonzero(~compiled.terminal)
+        })